@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app's modules import each other by bare name, as they run from chat/.
+sys.path.insert(0, os.path.join(ROOT, "chat"))
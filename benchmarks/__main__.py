@@ -0,0 +1,32 @@
+import argparse
+import logging
+
+from benchmarks import (
+    generation,
+    ingest,
+    retrieval,
+    serving,
+    vectorstore,
+    voice,
+)
+from logs import configure_logging
+
+AREAS = (serving, ingest, generation, voice, retrieval, vectorstore)
+
+
+def main():
+    configure_logging()
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Chat server benchmarks."
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    for area in AREAS:
+        area.add_parsers(subparsers)
+
+    args = parser.parse_args()
+    logging.info(f"Running benchmark: {args.benchmark}")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import os
+import resource
+import sys
+import threading
+
+from benchmarks import ROOT
+
+
+DEFAULT_QUESTIONS = [
+    "What do you do?",
+    "How can I contact you?",
+    "Which services do you offer?",
+    "Who are your clients?",
+]
+
+
+def current_rss_mb():
+    """Returns the resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_pss_mb():
+    """Proportional set size in MB: shared pages count once across processes."""
+    try:
+        with open("/proc/self/smaps_rollup", "r") as file:
+            for line in file:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as file:
+                # The fields after the parenthesized command: state, ppid, ...
+                ppid = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def process_memory_mb(pid):
+    """(RSS, PSS) of a process in MB; PSS is None where the kernel lacks it."""
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as file:
+            for line in file:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if rss is None:
+        try:
+            with open(f"/proc/{pid}/status", "r") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        rss = int(line.split()[1]) / 1024
+        except OSError:
+            rss = 0.0
+    return rss, pss
+
+
+class PeakMemory:
+    """Samples the memory of this process and its children in a thread.
+
+    Records the peak of their summed RSS and PSS, and of the largest child's
+    RSS, so work done in worker processes is counted too.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.rss_mb = 0.0
+        self.pss_mb = None
+        self.child_rss_mb = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def sample(self):
+        pid = os.getpid()
+        rss, pss = process_memory_mb(pid)
+        for child in child_pids(pid):
+            child_rss, child_pss = process_memory_mb(child)
+            self.child_rss_mb = max(self.child_rss_mb, child_rss)
+            rss += child_rss
+            pss = None if pss is None or child_pss is None else pss + child_pss
+        self.rss_mb = max(self.rss_mb, rss)
+        if pss is not None:
+            self.pss_mb = max(self.pss_mb or 0.0, pss)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def load_questions(path):
+    if not path:
+        return DEFAULT_QUESTIONS
+    with open(path, "r") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def report(name, **fields):
+    result = {"benchmark": name, **fields}
+    print(json.dumps(result))
+    return result
+
+
+def probe_command(*args):
+    """Command line running a benchmark subcommand in a fresh interpreter."""
+    return [sys.executable, "-m", "benchmarks", *args]
+
+
+def probe_env(**overrides):
+    """This environment with the repo importable from any working directory."""
+    path = os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH"))))
+    return dict(os.environ, PYTHONPATH=path, **overrides)
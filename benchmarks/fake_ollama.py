@@ -0,0 +1,228 @@
+import hashlib
+import json
+import math
+import re
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIMENSIONS = 64
+WORD_PATTERN = re.compile(r"\w+")
+DURATION_PATTERN = re.compile(r"(-?[\d.]+)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def fake_embedding(text):
+    """Deterministic bag-of-words vector, so texts sharing words are similar."""
+    vector = [0.0] * DIMENSIONS
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        vector[digest[0] % DIMENSIONS] += 1.0 if digest[1] % 2 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def parse_keep_alive(value, default):
+    """Seconds to keep the model loaded, from a number or a duration string."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        seconds = sum(
+            float(number) * DURATION_UNITS[unit]
+            for number, unit in DURATION_PATTERN.findall(value)
+        )
+    else:
+        seconds = float(value)
+    return math.inf if seconds < 0 else seconds
+
+
+def render_messages(messages):
+    """Stands in for the model's chat template."""
+    return "".join(
+        f"<|{message['role']}|>{message['content']}\n" for message in messages
+    )
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    server_version = "FakeOllama/1.0"
+    # Chunked streaming like the real server, so clients see each token as
+    # it is written instead of buffering the response.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        fake = self.server.fake
+        fake.count(self.path)
+        time.sleep(fake.latency)
+
+        if self.path in fake.missing:
+            self.send_json({"error": "not found"}, status=404)
+        elif fake.fail():
+            self.send_json({"error": "server busy"}, status=503)
+        elif self.path == "/api/embed":
+            inputs = payload["input"]
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            time.sleep(fake.embed_latency * len(inputs))
+            self.send_json({"embeddings": [fake_embedding(text) for text in inputs]})
+        elif self.path == "/api/embeddings":
+            time.sleep(fake.embed_latency)
+            self.send_json({"embedding": fake_embedding(payload["prompt"])})
+        elif self.path == "/api/generate":
+            self.generate(
+                payload, payload.get("prompt", ""), lambda text: {"response": text}
+            )
+        elif self.path == "/api/chat":
+            self.generate(
+                payload,
+                render_messages(payload.get("messages", [])),
+                lambda text: {"message": {"role": "assistant", "content": text}},
+            )
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def generate(self, payload, prompt, wrap):
+        fake = self.server.fake
+        prompt_tokens = fake.prefill(prompt, payload.get("keep_alive"))
+        tokens = [f"{word} " for word in fake.answer.split()]
+
+        if not payload.get("stream", True):
+            time.sleep(fake.token_latency * len(tokens))
+            fake.finish(payload.get("keep_alive"))
+            self.send_json({**wrap("".join(tokens)), "done": True})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(fake.token_latency)
+            self.send_chunk({**wrap(token), "done": False})
+        fake.finish(payload.get("keep_alive"))
+        self.send_chunk({**wrap(""), "done": True, "prompt_eval_count": prompt_tokens})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_chunk(self, payload):
+        line = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+class FakeOllama:
+    """A local stand-in for the Ollama HTTP API, for benchmarks and tests.
+
+    Embeddings are deterministic and generation streams a fixed answer.
+    Latencies are in seconds: `latency` per request, `embed_latency` per
+    embedded text, `prefill_latency` per prompt token and `token_latency`
+    per generated token.
+
+    Like Ollama, the model is loaded on demand, taking `load_latency`, and
+    unloaded once idle for the request's keep_alive, or `default_keep_alive`
+    seconds without one. Each of `slots` remembers its last prompt, and a
+    request only prefills the part after the longest prefix it shares with
+    one of them.
+
+    Paths in `missing` answer 404, as on an older server, and the first
+    `failures` requests answer 503, to exercise client retries.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        embed_latency=0.0,
+        prefill_latency=0.0,
+        token_latency=0.0,
+        answer="We are a company that helps you ship software.",
+        load_latency=0.0,
+        default_keep_alive=300.0,
+        slots=1,
+        missing=(),
+        failures=0,
+    ):
+        self.latency = latency
+        self.embed_latency = embed_latency
+        self.prefill_latency = prefill_latency
+        self.token_latency = token_latency
+        self.answer = answer
+        self.load_latency = load_latency
+        self.default_keep_alive = default_keep_alive
+        self.slots = [""] * slots
+        self.missing = set(missing)
+        self.failures = failures
+        self.loaded_until = 0.0
+        self.prefilled_tokens = 0
+        self.loads = 0
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def fail(self):
+        """Whether this request should fail, counting down `failures`."""
+        with self.lock:
+            if self.failures <= 0:
+                return False
+            self.failures -= 1
+            return True
+
+    def prefill(self, prompt, keep_alive):
+        """Sleeps as long as loading the model and evaluating the uncached
+        part of the prompt would take, and returns the evaluated tokens."""
+        with self.lock:
+            now = time.monotonic()
+            load = self.load_latency if now >= self.loaded_until else 0.0
+            if load:
+                self.loads += 1
+                self.slots = [""] * len(self.slots)
+            shared = [len(os.path.commonprefix([slot, prompt])) for slot in self.slots]
+            slot = shared.index(max(shared))
+            self.slots[slot] = prompt
+            tokens = (len(prompt) - shared[slot]) // 4
+            self.prefilled_tokens += tokens
+            # Stays loaded while generating; the keep-alive starts after.
+            self.loaded_until = math.inf
+        time.sleep(load + self.prefill_latency * tokens)
+        return tokens
+
+    def finish(self, keep_alive):
+        keep_alive = parse_keep_alive(keep_alive, self.default_keep_alive)
+        with self.lock:
+            self.loaded_until = time.monotonic() + keep_alive
+
+    def unload(self):
+        with self.lock:
+            self.loaded_until = 0.0
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
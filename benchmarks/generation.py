@@ -0,0 +1,243 @@
+import asyncio
+import os
+import time
+from statistics import mean
+
+from benchmarks.common import percentile, report
+from benchmarks.retrieval import fixture_corpus, known_item_questions, retrieval_fixture
+
+
+def bench_history(args):
+    """Chat-history messages written per second under concurrent sessions."""
+    import sqlite3
+    import tempfile
+    from history import INSERT_MESSAGE, ChatHistoryStore, create_schema
+
+    async def save_per_connection(database_file, conversation_id, content, role):
+        # The previous app.save_chat: one blocking connection per message.
+        con = sqlite3.connect(database_file)
+        con.execute(INSERT_MESSAGE, (conversation_id, content, role))
+        con.commit()
+        con.close()
+
+    async def session(save, conversation_id):
+        for idx in range(args.messages):
+            await save(conversation_id, f"Message {idx}", "user")
+            await asyncio.sleep(0)
+
+    async def run(save, sessions):
+        await asyncio.gather(*(session(save, f"conv-{idx}") for idx in range(sessions)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for sessions in args.sessions:
+            for mode in ("per-connection", "store"):
+                database_file = os.path.join(tmp_dir, f"{mode}-{sessions}.db")
+                con = sqlite3.connect(database_file)
+                create_schema(con)
+                con.close()
+
+                started = time.perf_counter()
+                if mode == "store":
+                    store = ChatHistoryStore(database_file)
+
+                    async def run_store():
+                        await run(store.save, sessions)
+                        await store.flush()
+
+                    asyncio.run(run_store())
+                    store.close()
+                else:
+                    asyncio.run(
+                        run(
+                            lambda *row: save_per_connection(database_file, *row),
+                            sessions,
+                        )
+                    )
+                elapsed = time.perf_counter() - started
+                total = sessions * args.messages
+                report(
+                    "history",
+                    mode=mode,
+                    sessions=sessions,
+                    messages=total,
+                    messages_per_s=round(total / elapsed, 1),
+                )
+
+
+def bench_memory(args):
+    """Prompt tokens and time-to-first-token across a long chat session."""
+    import config
+    from benchmarks.fake_ollama import FakeOllama
+    from langchain.prompts import ChatPromptTemplate
+    from langchain_community.llms import Ollama
+    from memory import ConversationMemory
+    from tokens import count_tokens
+
+    template = config.base_prompt + config.custom_prompt
+    prompt_template = ChatPromptTemplate.from_template(
+        template or "{context}\n\n{chat_history}\n\n{question}"
+    )
+    context = "Document 1: \n\n" + "We provide managed DevOps services. " * 50
+    answer = " ".join(["We can help you plan, build and operate your software."] * 6)
+
+    with FakeOllama(prefill_latency=args.prefill_latency, answer=answer) as fake:
+        llm = Ollama(base_url=fake.url, model="fake")
+        for mode in ("string", "memory"):
+            chat_history = ""
+            memory = ConversationMemory()
+            for turn in range(1, args.turns + 1):
+                if mode == "memory":
+                    chat_history = memory.render()
+                question = f"Question number {turn} about your services?"
+                prompt = prompt_template.format(
+                    context=context, chat_history=chat_history, question=question
+                )
+
+                started = time.perf_counter()
+                stream = llm.stream(prompt)
+                res = next(stream)
+                ttft = time.perf_counter() - started
+                res += "".join(stream)
+
+                if mode == "memory":
+                    memory.add(question, res)
+                else:
+                    chat_history += f"Human: {question}\nAI: {res}\n"
+                if turn % args.every == 0:
+                    report(
+                        "memory",
+                        mode=mode,
+                        turn=turn,
+                        prompt_tokens=count_tokens(prompt),
+                        ttft_ms=round(ttft * 1000, 1),
+                    )
+
+
+def bench_ttft(args):
+    """Time to first token over a conversation, by prompt layout and keep-alive."""
+    import tempfile
+
+    from benchmarks.fake_ollama import FakeOllama
+
+    answer = " ".join(["We can help you plan, build and operate your software."] * 6)
+    with tempfile.TemporaryDirectory() as folder, FakeOllama(
+        prefill_latency=args.prefill_latency,
+        token_latency=args.token_latency,
+        answer=answer,
+        load_latency=args.load_latency,
+        default_keep_alive=args.default_keep_alive,
+    ) as fake:
+        data_path = os.path.join(folder, "data")
+        os.makedirs(data_path)
+        fixture_corpus(data_path, args.files)
+        engine, chunks = retrieval_fixture(folder, data_path, fake.url)
+        import config
+        import rag
+        from memory import ConversationMemory
+
+        questions = known_item_questions(chunks, engine.keyword_index, args.turns)
+        budget = args.memory_budget or config.memory_token_budget
+        modes = [
+            ("template-generate", "generate", "", config.memory_compact_ratio),
+            (
+                "template-generate-keep-alive",
+                "generate",
+                args.keep_alive,
+                config.memory_compact_ratio,
+            ),
+        ] + [
+            ("stable-chat-keep-alive", "chat", args.keep_alive, ratio)
+            for ratio in args.compact_ratios
+        ]
+        for mode, generation_mode, keep_alive, compact_ratio in modes:
+            config.generation_mode = generation_mode
+            config.model_keep_alive = keep_alive
+            engine = rag.Rag(
+                vectorstore=engine.vectorstore, keyword_index=engine.keyword_index
+            )
+            fake.unload()
+            fake.loads = fake.prefilled_tokens = 0
+            memory = ConversationMemory(
+                token_budget=budget, compact_ratio=compact_ratio
+            )
+            ttfts = []
+            for question, _ in questions:
+                inputs = {"question": question, "chat_history": memory.render()}
+                started = time.perf_counter()
+                stream = engine.chain.stream(inputs)
+                res = next(stream)
+                ttfts.append(time.perf_counter() - started)
+                res += "".join(stream)
+                memory.add(question, res)
+                time.sleep(args.think_time)
+            report(
+                "ttft",
+                mode=mode,
+                turns=len(ttfts),
+                memory_budget=budget,
+                compact_ratio=compact_ratio,
+                compactions=memory.compactions,
+                model_loads=fake.loads,
+                prefilled_tokens_mean=round(fake.prefilled_tokens / len(ttfts)),
+                ttft_p50_ms=round(percentile(ttfts, 50) * 1000, 1),
+                ttft_p95_ms=round(percentile(ttfts, 95) * 1000, 1),
+                ttft_mean_ms=round(mean(ttfts) * 1000, 1),
+            )
+
+
+def add_parsers(subparsers):
+    history = subparsers.add_parser("history", help=bench_history.__doc__)
+    history.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    history.add_argument("--messages", type=int, default=50)
+    history.set_defaults(func=bench_history)
+
+    memory = subparsers.add_parser("memory", help=bench_memory.__doc__)
+    memory.add_argument("--turns", type=int, default=60)
+    memory.add_argument("--every", type=int, default=10)
+    memory.add_argument(
+        "--prefill-latency",
+        type=float,
+        default=0.0001,
+        help="Fake server seconds per prompt token.",
+    )
+    memory.set_defaults(func=bench_memory)
+
+    ttft = subparsers.add_parser("ttft", help=bench_ttft.__doc__)
+    ttft.add_argument("--files", type=int, default=200)
+    ttft.add_argument("--turns", type=int, default=12)
+    ttft.add_argument(
+        "--prefill-latency",
+        type=float,
+        default=0.0005,
+        help="Fake server seconds per prompt token.",
+    )
+    ttft.add_argument("--token-latency", type=float, default=0.002)
+    ttft.add_argument(
+        "--load-latency", type=float, default=1.0, help="Fake model load seconds."
+    )
+    ttft.add_argument(
+        "--default-keep-alive",
+        type=float,
+        default=0.5,
+        help="Fake server seconds before unloading an idle model.",
+    )
+    ttft.add_argument(
+        "--think-time",
+        type=float,
+        default=1.0,
+        help="Seconds between turns; longer than --default-keep-alive.",
+    )
+    ttft.add_argument("--keep-alive", default="30m")
+    ttft.add_argument(
+        "--memory-budget",
+        type=int,
+        help="Chat memory tokens; defaults to MEMORY_TOKEN_BUDGET.",
+    )
+    ttft.add_argument(
+        "--compact-ratios",
+        type=float,
+        nargs="+",
+        default=[1.0, 0.5],
+        help="Memory compaction ratios to compare in chat mode.",
+    )
+    ttft.set_defaults(func=bench_ttft)
@@ -0,0 +1,411 @@
+import os
+import time
+from statistics import mean
+
+from benchmarks.common import PeakMemory, load_questions, percentile, report
+
+
+def bench_chunking(args):
+    """Prompt tokens and end-to-end latency of chunked vs whole-file documents."""
+    import chunker
+    import config
+    import rag
+    from chromadb.config import Settings
+    from langchain.docstore.document import Document
+    from embeddings import OllamaBatchEmbeddings
+    from langchain_community.vectorstores import Chroma
+
+    file_paths = [
+        os.path.join(config.data_path, file_name)
+        for file_name in sorted(os.listdir(config.data_path))
+    ]
+
+    def whole_files():
+        for file_path in file_paths:
+            with open(file_path, "r") as file:
+                yield Document(
+                    page_content=file.read(),
+                    metadata={"source": os.path.basename(file_path)},
+                )
+
+    def chunks():
+        for file_path in file_paths:
+            yield from chunker.iter_file_chunks(file_path)
+
+    embedding = OllamaBatchEmbeddings()
+    questions = load_questions(args.questions)
+    for mode, documents in (("whole-file", whole_files), ("chunked", chunks)):
+        vectorstore = Chroma(
+            collection_name=f"benchmark_{mode}",
+            embedding_function=embedding,
+            client_settings=Settings(anonymized_telemetry=False),
+        )
+        started = time.perf_counter()
+        document_count = 0
+        for batch in chunker.batched(documents(), config.ingest_batch_size):
+            vectorstore.add_documents(batch)
+            document_count += len(batch)
+        ingest_seconds = time.perf_counter() - started
+
+        engine = rag.Rag(vectorstore=vectorstore)
+        prompt_tokens = []
+        latencies = []
+        for question in questions:
+            docs = engine.retriever.invoke(question)
+            prompt = engine.prompt_builder.build(question, "", docs)
+            prompt_tokens.append(prompt.tokens["total"])
+
+            started = time.perf_counter()
+            engine.chain.invoke({"question": question, "chat_history": ""})
+            latencies.append(time.perf_counter() - started)
+
+        vectorstore.delete_collection()
+        report(
+            "chunking",
+            mode=mode,
+            documents=document_count,
+            ingest_s=round(ingest_seconds, 2),
+            prompt_tokens_mean=round(mean(prompt_tokens)),
+            prompt_tokens_max=max(prompt_tokens),
+            latency_p50_ms=round(percentile(latencies, 50) * 1000, 1),
+            latency_p95_ms=round(percentile(latencies, 95) * 1000, 1),
+        )
+
+
+def bench_embeddings(args):
+    """Chunks embedded per second against a local fake Ollama server."""
+    from embeddings import OllamaBatchEmbeddings
+    from benchmarks.fake_ollama import FakeOllama
+    from langchain_community.embeddings import OllamaEmbeddings
+
+    texts = [
+        f"Chunk {idx} about our managed DevOps services and support."
+        for idx in range(args.chunks)
+    ]
+    with FakeOllama(latency=args.latency) as fake:
+        clients = [
+            ("sequential", 1, 1, OllamaEmbeddings(base_url=fake.url, model="fake"))
+        ]
+        for concurrency in args.concurrency:
+            client = OllamaBatchEmbeddings(
+                base_url=fake.url,
+                model="fake",
+                batch_size=args.batch_size,
+                concurrency=concurrency,
+            )
+            clients.append(("batched", args.batch_size, concurrency, client))
+
+        for name, batch_size, concurrency, client in clients:
+            started = time.perf_counter()
+            vectors = client.embed_documents(texts)
+            elapsed = time.perf_counter() - started
+            assert len(vectors) == len(texts)
+            report(
+                "embeddings",
+                client=name,
+                batch_size=batch_size,
+                concurrency=concurrency,
+                chunks=len(texts),
+                chunks_per_s=round(len(texts) / elapsed, 1),
+            )
+
+
+def fixture_site(pages, latency, fanout=4):
+    """Serves `pages` linked HTML pages on localhost, as a crawl fixture."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            page = int(self.path.strip("/").removesuffix(".html") or 0)
+            if page >= pages:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            children = range(page * fanout + 1, min(pages, page * fanout + fanout + 1))
+            links = "".join(
+                f'<a href="/{child}.html">Page {child}</a>' for child in children
+            )
+            text = f"<p>Page {page} of the fixture site about DevOps services.</p>" * 10
+            body = f"<html><body><main>{text}{links}</main></body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_crawl(args):
+    """Crawl throughput against a local fixture site."""
+    import bootstrap
+    import config
+
+    server = fixture_site(args.pages, args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        for concurrency in args.concurrency:
+            config.crawl_concurrency = concurrency
+            scraper = bootstrap.WebScraper(base_url)
+            scraper.limiter = bootstrap.HostLimiter(
+                per_host=concurrency, delay=args.delay
+            )
+            started = time.perf_counter()
+            scraper.crawl_urls()
+            elapsed = time.perf_counter() - started
+            report(
+                "crawl",
+                concurrency=concurrency,
+                pages=len(scraper.urls) + 1,
+                seconds=round(elapsed, 2),
+                pages_per_s=round((len(scraper.urls) + 1) / elapsed, 1),
+            )
+    finally:
+        server.shutdown()
+
+
+def fixture_pdf(path, pages, lines=40):
+    """Writes a plain-text PDF with `pages` pages, as an ingestion fixture."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        text = "".join(
+            f"({page}.{line} DevOps services, cloud migration and support.) Tj T* "
+            for line in range(lines)
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 780 Td {text}ET".encode()
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+
+
+def bench_pdf(args):
+    """PDF text extraction: serial in memory vs streamed through a process pool."""
+    import tempfile
+
+    import bootstrap
+    from PyPDF2 import PdfReader
+
+    with tempfile.TemporaryDirectory() as folder:
+        pdf_path = os.path.join(folder, "fixture.pdf")
+        fixture_pdf(pdf_path, args.pages)
+        size_mb = round(os.path.getsize(pdf_path) / 1024 / 1024, 1)
+        raw_path = os.path.join(folder, "raw.txt")
+
+        def serial():
+            content = ""
+            for page in PdfReader(pdf_path).pages:
+                content += f"{page.extract_text()}\n\n"
+            with open(raw_path, "w") as file:
+                file.write(content)
+
+        def streamed(workers):
+            with open(raw_path, "w") as file:
+                for text in bootstrap.iter_pdf_pages(pdf_path, workers=workers):
+                    file.write(f"{text}\n\n")
+
+        runs = [("serial", 1, serial)] + [
+            ("streamed", workers, lambda workers=workers: streamed(workers))
+            for workers in args.workers
+        ]
+        for mode, workers, run in runs:
+            with PeakMemory() as memory:
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+            report(
+                "pdf",
+                mode=mode,
+                workers=workers,
+                pages=args.pages,
+                pdf_mb=size_mb,
+                seconds=round(elapsed, 2),
+                pages_per_s=round(args.pages / elapsed, 1),
+                # Summed over this process and its workers; PSS counts
+                # pages the workers share with it once.
+                peak_rss_mb=round(memory.rss_mb, 1),
+                peak_pss_mb=memory.pss_mb and round(memory.pss_mb, 1),
+                peak_worker_rss_mb=round(memory.child_rss_mb, 1),
+            )
+
+
+def fixture_pages(folder, pages, duplicates):
+    """Writes `pages` HTML pages sharing a navigation bar, sidebar, footer and
+    cookie banner, the last `duplicates` of them near-copies of earlier ones.
+    Returns the (url, path) jobs."""
+    import random
+
+    rng = random.Random(11)
+    words = [
+        "".join(rng.choice("bcdfghklmnprst") + rng.choice("aeiou") for _ in range(3))
+        for _ in range(800)
+    ]
+    nav = "".join(
+        f'<li><a href="/{number}">Section {number}</a></li>' for number in range(12)
+    )
+    chrome = (
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        "<div class='sidebar'><h3>Related</h3><ul>"
+        + "".join(f"<li>Popular topic {number}</li>" for number in range(8))
+        + "</ul></div>"
+    )
+    footer = (
+        "<footer><p>1 Example Street, Springfield. Call us on 555 0100.</p>"
+        "<p>Copyright 2024. All rights reserved.</p></footer>"
+        "<div class='cookies'>We use cookies to improve your experience.</div>"
+    )
+    bodies = []
+    jobs = []
+    for number in range(pages):
+        if number >= pages - duplicates:
+            # A print view or tracking-parameter copy with one word changed.
+            paragraphs = list(bodies[number - (pages - duplicates)])
+            paragraphs[0] = paragraphs[0].replace(" ", " updated ", 1)
+        else:
+            paragraphs = [
+                " ".join(rng.choice(words) for _ in range(80)) for _ in range(6)
+            ]
+        bodies.append(paragraphs)
+        content = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+        html = (
+            f"<html><head><title>Page {number}</title></head><body>{chrome}"
+            f"<div class='content'><h1>Page {number}</h1>{content}</div>"
+            f"{footer}</body></html>"
+        )
+        path = os.path.join(folder, f"{number}.html")
+        with open(path, "w") as file:
+            file.write(html)
+        jobs.append((f"https://example.com/page/{number}", path))
+    return jobs
+
+
+def bench_extract(args):
+    """Text written for the chunker: main-or-body text vs the extraction stage."""
+    import io
+    import tempfile
+
+    import chunker
+    import config
+    from bs4 import BeautifulSoup
+    from extract import SiteExtractor
+
+    def body_text(path):
+        # The previous create_txt: <main>, else <body> without header and footer.
+        with open(path, "r") as file:
+            soup = BeautifulSoup(file.read(), "lxml")
+        content = soup.find("main") or soup.find("body")
+        for tag in content.find_all(["header", "footer"]):
+            tag.extract()
+        return content.get_text("\n").replace("\n\n", "")
+
+    def measure(texts):
+        chars = chunks = 0
+        for text in texts:
+            chars += len(text)
+            chunks += sum(
+                1
+                for _ in chunker.iter_text_chunks(
+                    io.StringIO(text), config.chunk_size, config.chunk_overlap
+                )
+            )
+        return chars, chunks
+
+    with tempfile.TemporaryDirectory() as folder:
+        jobs = fixture_pages(folder, args.pages, args.duplicates)
+        runs = [("body-text", 1, None)] + [
+            ("extract", workers, SiteExtractor(workers=workers))
+            for workers in args.workers
+        ]
+        for mode, workers, extractor in runs:
+            started = time.perf_counter()
+            if extractor is None:
+                texts = [body_text(path) for _, path in jobs]
+            else:
+                texts = [text for _, _, text in extractor.run(jobs)]
+                texts.append("\n\n".join(extractor.boilerplate))
+            elapsed = time.perf_counter() - started
+            chars, chunks = measure(texts)
+            report(
+                "extract",
+                mode=mode,
+                workers=workers,
+                pages=len(jobs),
+                seconds=round(elapsed, 2),
+                pages_per_s=round(len(jobs) / elapsed, 1),
+                files=len(texts),
+                duplicates=len(extractor.duplicates) if extractor else 0,
+                chars=chars,
+                chunks=chunks,
+            )
+
+
+def add_parsers(subparsers):
+    chunking = subparsers.add_parser("chunking", help=bench_chunking.__doc__)
+    chunking.add_argument("--questions", help="File with one question per line.")
+    chunking.set_defaults(func=bench_chunking)
+
+    embeddings = subparsers.add_parser("embeddings", help=bench_embeddings.__doc__)
+    embeddings.add_argument("--chunks", type=int, default=2000)
+    embeddings.add_argument("--batch-size", type=int, default=32)
+    embeddings.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    embeddings.add_argument(
+        "--latency", type=float, default=0.01, help="Fake server seconds per request."
+    )
+    embeddings.set_defaults(func=bench_embeddings)
+
+    crawl = subparsers.add_parser("crawl", help=bench_crawl.__doc__)
+    crawl.add_argument("--pages", type=int, default=200)
+    crawl.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    crawl.add_argument(
+        "--latency", type=float, default=0.05, help="Fixture seconds per page."
+    )
+    crawl.add_argument(
+        "--delay", type=float, default=0.0, help="Per-host politeness delay."
+    )
+    crawl.set_defaults(func=bench_crawl)
+
+    pdf = subparsers.add_parser("pdf", help=bench_pdf.__doc__)
+    pdf.add_argument("--pages", type=int, default=2000)
+    pdf.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    pdf.set_defaults(func=bench_pdf)
+
+    extract = subparsers.add_parser("extract", help=bench_extract.__doc__)
+    extract.add_argument("--pages", type=int, default=500)
+    extract.add_argument(
+        "--duplicates", type=int, default=50, help="Near-copies among the pages."
+    )
+    extract.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    extract.set_defaults(func=bench_extract)
@@ -0,0 +1,443 @@
+import json
+import os
+import shutil
+import time
+from statistics import mean
+
+from benchmarks import ROOT
+from benchmarks.common import load_questions, percentile, report
+
+
+def fixture_corpus(folder, files):
+    """Writes `files` text documents, each about one program with its own
+    name, acronym and address amid shared filler text."""
+    import random
+
+    rng = random.Random(7)
+    filler = (
+        "Our team offers support, training and community resources for older "
+        "adults and caregivers. Contact us to learn more about eligibility. "
+    )
+    for number in range(files):
+        acronym = "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(4))
+        name = f"{rng.choice(['Bright', 'Silver', 'Harbor', 'Maple'])}{number}"
+        text = (
+            f"The {name} program ({acronym}) helps members stay independent at "
+            f"home. Visit the {acronym} office at {100 + number} Elm Street, "
+            f"suite {rng.randint(1, 999)}. " + filler * rng.randint(3, 12)
+        )
+        with open(os.path.join(folder, f"data_{number}.txt"), "w") as file:
+            file.write(text)
+
+
+def retrieval_fixture(folder, data_path, ollama_url):
+    """Embeds `data_path` into a fresh store under `folder` and returns the
+    Rag engine built on it, along with the embedded chunks.
+
+    Must run before config is imported, since it points the store and the
+    Ollama client at the fixture.
+    """
+    os.environ["OLLAMA_SERVER"] = ollama_url
+    os.environ["VECTOR_DATABASE_PATH"] = os.path.join(folder, "vector-database")
+    storage_path = os.environ.get("BASE_STORAGE_PATH", "storage")
+    if not os.path.exists(os.path.join(storage_path, "base_prompt.txt")):
+        # Outside a deployment, prompt with the templates checked into the repo.
+        prompts_path = os.path.join(ROOT, "prompts")
+        shutil.copytree(prompts_path, folder, dirs_exist_ok=True)
+        os.environ["BASE_STORAGE_PATH"] = folder
+    os.makedirs(os.environ["VECTOR_DATABASE_PATH"])
+    import chunker
+    import embed
+    import rag
+    from embeddings import OllamaBatchEmbeddings
+    from keyword_index import KeywordIndex
+
+    vectorstore = embed.open_vectorstore(OllamaBatchEmbeddings())
+    keyword_index = KeywordIndex()
+    manifest = embed.load_manifest()
+    embed.embed_folder(vectorstore, keyword_index, manifest, data_path)
+    keyword_index.save()
+    manifest["version"] += 1
+    embed.save_manifest(manifest)
+    chunks = [
+        chunk
+        for file_name in sorted(os.listdir(data_path))
+        for chunk in chunker.iter_file_chunks(os.path.join(data_path, file_name))
+    ]
+    return rag.Rag(vectorstore=vectorstore, keyword_index=keyword_index), chunks
+
+
+def known_item_questions(chunks, keyword_index, count, max_df=3):
+    """Builds (question, source) pairs from the rarest terms of random chunks,
+    like the exact-term questions users ask about names and acronyms.
+
+    Chunks with no term rarer than `max_df` chunks are skipped, since no
+    question could single them out.
+    """
+    import random
+
+    from keyword_index import tokenize
+
+    def document_frequency(term):
+        return len(keyword_index.postings.get(term, ()))
+
+    rng = random.Random(11)
+    questions = []
+    for chunk in rng.sample(chunks, len(chunks)):
+        if len(questions) == count:
+            break
+        terms = sorted(set(tokenize(chunk.page_content)), key=document_frequency)
+        if not terms or document_frequency(terms[0]) > max_df:
+            continue
+        questions.append(
+            (f"Tell me about {' '.join(terms[:3])}", chunk.metadata["source"])
+        )
+    return questions
+
+
+def bench_retrieval(args):
+    """Recall@k and latency of vector, keyword and hybrid retrieval."""
+    import tempfile
+
+    from benchmarks.fake_ollama import FakeOllama
+
+    with tempfile.TemporaryDirectory() as folder, FakeOllama() as fake:
+        data_path = args.data
+        if data_path is None:
+            data_path = os.path.join(folder, "data")
+            os.makedirs(data_path)
+            fixture_corpus(data_path, args.files)
+        engine, chunks = retrieval_fixture(folder, data_path, args.ollama or fake.url)
+
+        if args.eval:
+            with open(args.eval, "r") as file:
+                items = [json.loads(line) for line in file if line.strip()]
+            questions = [(item["question"], item["source"]) for item in items]
+        else:
+            questions = known_item_questions(
+                chunks, engine.keyword_index, args.questions
+            )
+
+        scoring = []
+        for question, _ in questions:
+            started = time.perf_counter()
+            engine.keyword_index.search(question, max(args.k))
+            scoring.append(time.perf_counter() - started)
+        report(
+            "retrieval",
+            mode="bm25-scoring",
+            documents=len(engine.keyword_index),
+            latency_p50_ms=round(percentile(scoring, 50) * 1000, 3),
+            latency_p99_ms=round(percentile(scoring, 99) * 1000, 3),
+        )
+
+        for mode in ("vector", "keyword", "hybrid"):
+            engine.query_cache.clear()
+            hits = {k: 0 for k in args.k}
+            latencies = []
+            for question, source in questions:
+                started = time.perf_counter()
+                docs = engine.search(question, mode=mode, k=max(args.k))
+                latencies.append(time.perf_counter() - started)
+                sources = [doc.metadata.get("source") for doc in docs]
+                for k in args.k:
+                    hits[k] += source in sources[:k]
+            report(
+                "retrieval",
+                mode=mode,
+                questions=len(questions),
+                **{
+                    f"recall_at_{k}": round(hits[k] / len(questions), 3)
+                    for k in args.k
+                },
+                latency_p50_ms=round(percentile(latencies, 50) * 1000, 2),
+                latency_p95_ms=round(percentile(latencies, 95) * 1000, 2),
+            )
+
+
+def load_labelled_questions(path):
+    """Reads (question, source) pairs from JSONL, or plain questions with no
+    expected source from a text file with one question per line."""
+    if path.endswith(".jsonl"):
+        with open(path, "r") as file:
+            items = [json.loads(line) for line in file if line.strip()]
+        return [(item["question"], item.get("source")) for item in items]
+    return [(question, None) for question in load_questions(path)]
+
+
+def clear_caches(engine):
+    """Empties the engine's caches, so the next call takes the cold path."""
+    engine.query_cache.clear()
+    engine.retrieval_cache.clear()
+    if engine.reranker is not None:
+        engine.reranker.scores.clear()
+    if engine.answer_cache is not None:
+        engine.answer_cache.clear()
+
+
+def bench_rag(args):
+    """Per-stage latency percentiles and hit rate of the retriever and chain.
+
+    Caches are emptied before each timed retrieval and chain call, so every
+    sample pays for the embedding and the search.
+    """
+    import tempfile
+
+    from benchmarks.fake_ollama import FakeOllama
+
+    with tempfile.TemporaryDirectory() as folder, FakeOllama(
+        prefill_latency=args.prefill_latency, token_latency=args.token_latency
+    ) as fake:
+        data_path = args.data
+        if data_path is None:
+            data_path = os.path.join(folder, "data")
+            os.makedirs(data_path)
+            fixture_corpus(data_path, args.files)
+        engine, chunks = retrieval_fixture(folder, data_path, fake.url)
+        import config
+
+        if args.questions_file:
+            questions = load_labelled_questions(args.questions_file)
+        else:
+            questions = known_item_questions(
+                chunks, engine.keyword_index, args.questions
+            )
+
+        stages = {
+            name: []
+            for name in (
+                "embedding",
+                "vector_search",
+                "retrieval",
+                "prompt_assembly",
+                "first_token",
+                "generation",
+                "chain",
+            )
+        }
+        prompt_tokens = []
+        hits = labelled = 0
+        for _ in range(args.rounds):
+            for question, source in questions:
+                started = time.perf_counter()
+                vector = engine.embedding_function.embed_query(question)
+                stages["embedding"].append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                engine.vectorstore.similarity_search_by_vector(
+                    vector, k=config.number_of_retrieved_sources
+                )
+                stages["vector_search"].append(time.perf_counter() - started)
+
+                clear_caches(engine)
+                started = time.perf_counter()
+                docs = engine.retriever.invoke(question)
+                stages["retrieval"].append(time.perf_counter() - started)
+                if source is not None:
+                    labelled += 1
+                    hits += source in [doc.metadata.get("source") for doc in docs]
+
+                started = time.perf_counter()
+                prompt = engine.prompt_builder.build(question, "", docs)
+                stages["prompt_assembly"].append(time.perf_counter() - started)
+                prompt_tokens.append(prompt.tokens)
+
+                started = time.perf_counter()
+                model_input = prompt.messages if engine.chat else prompt.text
+                for index, _ in enumerate(engine.model.stream(model_input)):
+                    if index == 0:
+                        stages["first_token"].append(time.perf_counter() - started)
+                stages["generation"].append(time.perf_counter() - started)
+
+                clear_caches(engine)
+                started = time.perf_counter()
+                engine.chain.invoke({"question": question, "chat_history": ""})
+                stages["chain"].append(time.perf_counter() - started)
+
+        result = report(
+            "rag",
+            questions=len(questions),
+            rounds=args.rounds,
+            chunk_size=config.chunk_size,
+            retrieved_sources=config.number_of_retrieved_sources,
+            retrieval_mode=config.retrieval_mode,
+            model=config.model_name,
+            embedding_model=config.embedding_model_name,
+            hit_rate=round(hits / labelled, 3) if labelled else None,
+            cache=engine.cache_stats(),
+            prompt_tokens_mean={
+                part: round(mean(tokens[part] for tokens in prompt_tokens), 1)
+                for part in prompt_tokens[0]
+            },
+            stages_ms={
+                name: {
+                    f"p{pct}": round(percentile(values, pct) * 1000, 2)
+                    for pct in (50, 95, 99)
+                }
+                for name, values in stages.items()
+            },
+        )
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(result, file, indent=2)
+
+
+def overlap_reranker(latency):
+    """A Reranker scoring by question word overlap, sleeping `latency` seconds
+    per pair in place of cross-encoder inference. Needs no torch."""
+    from keyword_index import tokenize
+    from reranker import Reranker
+
+    class OverlapReranker(Reranker):
+        def predict(self, question, texts):
+            time.sleep(latency * len(texts))
+            words = set(tokenize(question))
+            return [
+                len(words & set(tokenize(text))) / (len(words) or 1)
+                for text in texts
+            ]
+
+    return OverlapReranker()
+
+
+def bench_rerank(args):
+    """Prompt size, hit rate and latency of top-k retrieval vs reranking.
+
+    Every timed call starts with empty caches, so the rerank latency includes
+    scoring all candidates. `--scorer overlap` swaps the cross-encoder for a
+    word-overlap stand-in with a fixed per-pair latency.
+    """
+    import tempfile
+
+    from benchmarks.fake_ollama import FakeOllama
+
+    with tempfile.TemporaryDirectory() as folder, FakeOllama(
+        prefill_latency=args.prefill_latency, token_latency=args.token_latency
+    ) as fake:
+        data_path = args.data
+        if data_path is None:
+            data_path = os.path.join(folder, "data")
+            os.makedirs(data_path)
+            fixture_corpus(data_path, args.files)
+        engine, chunks = retrieval_fixture(folder, data_path, fake.url)
+        import config
+        from reranker import Reranker
+
+        if args.questions_file:
+            questions = load_labelled_questions(args.questions_file)
+        else:
+            questions = known_item_questions(
+                chunks, engine.keyword_index, args.questions
+            )
+
+        if args.scorer == "overlap":
+            reranker = overlap_reranker(args.stand_in_latency)
+        else:
+            reranker = Reranker()
+        top_k = config.number_of_retrieved_sources
+        modes = [
+            (f"top-{top_k}", None, top_k),
+            (f"top-{config.rerank_candidates}", None, config.rerank_candidates),
+            (f"rerank-{config.context_token_budget}-tokens", reranker, top_k),
+        ]
+        for mode, mode_reranker, k in modes:
+            engine.reranker = mode_reranker
+            config.number_of_retrieved_sources = k
+            prompt_tokens = []
+            retrieval = []
+            latencies = []
+            hits = labelled = 0
+            for question, source in questions:
+                clear_caches(engine)
+                started = time.perf_counter()
+                docs = engine.retriever.invoke(question)
+                retrieval.append(time.perf_counter() - started)
+                if source is not None:
+                    labelled += 1
+                    hits += source in [doc.metadata.get("source") for doc in docs]
+                prompt = engine.prompt_builder.build(question, "", docs)
+                prompt_tokens.append(prompt.tokens["total"])
+
+                clear_caches(engine)
+                started = time.perf_counter()
+                engine.chain.invoke({"question": question, "chat_history": ""})
+                latencies.append(time.perf_counter() - started)
+            report(
+                "rerank",
+                mode=mode,
+                scorer=args.scorer if mode_reranker else None,
+                questions=len(questions),
+                hit_rate=round(hits / labelled, 3) if labelled else None,
+                prompt_tokens_mean=round(mean(prompt_tokens)),
+                prompt_tokens_max=max(prompt_tokens),
+                retrieval_p50_ms=round(percentile(retrieval, 50) * 1000, 1),
+                latency_p50_ms=round(percentile(latencies, 50) * 1000, 1),
+                latency_p95_ms=round(percentile(latencies, 95) * 1000, 1),
+            )
+        config.number_of_retrieved_sources = top_k
+
+
+def add_parsers(subparsers):
+    retrieval = subparsers.add_parser("retrieval", help=bench_retrieval.__doc__)
+    retrieval.add_argument(
+        "--data", help="Folder of documents to index; a fixture corpus by default."
+    )
+    retrieval.add_argument(
+        "--eval", help='JSONL file of {"question": ..., "source": ...} items.'
+    )
+    retrieval.add_argument("--files", type=int, default=200)
+    retrieval.add_argument("--questions", type=int, default=200)
+    retrieval.add_argument("--k", type=int, nargs="+", default=[1, 2, 5])
+    retrieval.add_argument(
+        "--ollama", help="Ollama server to embed with; a fake one by default."
+    )
+    retrieval.set_defaults(func=bench_retrieval)
+
+    rag = subparsers.add_parser("rag", help=bench_rag.__doc__)
+    rag.add_argument(
+        "--data", help="Folder of documents to index; a fixture corpus by default."
+    )
+    rag.add_argument(
+        "--questions-file",
+        help="JSONL of {question, source} items, or one question per line.",
+    )
+    rag.add_argument("--files", type=int, default=200)
+    rag.add_argument("--questions", type=int, default=100)
+    rag.add_argument(
+        "--rounds", type=int, default=2, help="Passes over the questions."
+    )
+    rag.add_argument("--prefill-latency", type=float, default=0.00005)
+    rag.add_argument("--token-latency", type=float, default=0.002)
+    rag.add_argument("--output", help="Also write the result to this JSON file.")
+    rag.set_defaults(func=bench_rag)
+
+    rerank = subparsers.add_parser("rerank", help=bench_rerank.__doc__)
+    rerank.add_argument(
+        "--data", help="Folder of documents to index; a fixture corpus by default."
+    )
+    rerank.add_argument(
+        "--questions-file",
+        help="JSONL of {question, source} items, or one question per line.",
+    )
+    rerank.add_argument("--files", type=int, default=200)
+    rerank.add_argument("--questions", type=int, default=50)
+    rerank.add_argument(
+        "--prefill-latency",
+        type=float,
+        default=0.0005,
+        help="Fake server seconds per prompt token.",
+    )
+    rerank.add_argument("--token-latency", type=float, default=0.002)
+    rerank.add_argument(
+        "--scorer",
+        choices=["cross-encoder", "overlap"],
+        default="cross-encoder",
+        help="overlap is a word-overlap stand-in that needs no torch.",
+    )
+    rerank.add_argument(
+        "--stand-in-latency",
+        type=float,
+        default=0.003,
+        help="Seconds per pair the overlap scorer sleeps for.",
+    )
+    rerank.set_defaults(func=bench_rerank)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import subprocess
+import time
+from statistics import mean
+
+from benchmarks.common import (
+    current_rss_mb,
+    percentile,
+    probe_command,
+    probe_env,
+    report,
+)
+from benchmarks.voice import tone_wav
+
+
+def bench_sessions(args):
+    """Session-open latency and RSS as concurrent chat sessions grow."""
+    import rag
+
+    async def open_session(shared):
+        started = time.perf_counter()
+        if shared:
+            engine = await asyncio.to_thread(rag.get_rag)
+        else:
+            engine = await asyncio.to_thread(rag.Rag)
+        return time.perf_counter() - started, engine
+
+    async def run(sessions, shared):
+        results = await asyncio.gather(
+            *(open_session(shared) for _ in range(sessions))
+        )
+        return [latency for latency, _ in results], [engine for _, engine in results]
+
+    for shared in (False, True):
+        rag._rag = None
+        baseline_rss = current_rss_mb()
+        engines = []
+        for sessions in args.sessions:
+            latencies, opened = asyncio.run(run(sessions, shared))
+            # Keep engines alive so RSS reflects every open session.
+            engines.extend(opened)
+            report(
+                "sessions",
+                mode="shared" if shared else "per-session",
+                sessions=sessions,
+                open_sessions=len(engines),
+                open_mean_ms=round(mean(latencies) * 1000, 2),
+                open_p95_ms=round(percentile(latencies, 95) * 1000, 2),
+                rss_delta_mb=round(current_rss_mb() - baseline_rss, 1),
+            )
+        del engines
+
+
+def bench_startup(args):
+    """Import time, time to first response and RSS, text-only vs voice."""
+    for mode, voice in (("text-only", "false"), ("voice", "true")):
+        probe = subprocess.run(
+            probe_command("startup-probe"),
+            env=probe_env(VOICE_ENABLED=voice),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        report("startup", mode=mode, **json.loads(probe.stdout.splitlines()[-1]))
+
+
+def bench_startup_probe(args):
+    """Measures one cold start; run in a fresh process by `startup`."""
+    from benchmarks.fake_ollama import FakeOllama
+
+    with FakeOllama() as fake:
+        os.environ["OLLAMA_SERVER"] = fake.url
+        started = time.perf_counter()
+        import app
+        import config
+
+        result = {"import_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+        async def first_token():
+            stream = app.get_rag().chain.astream(
+                {"question": "What do you do?", "chat_history": ""}
+            )
+            async for _ in stream:
+                return
+
+        asyncio.run(first_token())
+        result["first_response_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["rss_mb"] = round(current_rss_mb(), 1)
+
+        if config.voice_enabled:
+            transcribe_started = time.perf_counter()
+            asyncio.run(app.transcriber.transcribe(tone_wav(440)))
+            result["first_transcription_ms"] = round(
+                (time.perf_counter() - transcribe_started) * 1000, 1
+            )
+            result["rss_after_voice_mb"] = round(current_rss_mb(), 1)
+    print(json.dumps(result))
+
+
+def add_parsers(subparsers):
+    sessions = subparsers.add_parser("sessions", help=bench_sessions.__doc__)
+    sessions.add_argument(
+        "--sessions", type=int, nargs="+", default=[1, 10, 50, 100, 200]
+    )
+    sessions.set_defaults(func=bench_sessions)
+
+    startup = subparsers.add_parser("startup", help=bench_startup.__doc__)
+    startup.set_defaults(func=bench_startup)
+    startup_probe = subparsers.add_parser("startup-probe")
+    startup_probe.set_defaults(func=bench_startup_probe)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from statistics import mean
+
+from benchmarks.common import (
+    current_pss_mb,
+    current_rss_mb,
+    percentile,
+    probe_command,
+    probe_env,
+    report,
+)
+
+
+class FixtureEmbeddings:
+    """Random unit vectors keyed by text, so stores can be built and
+    queried without an embedding server."""
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def vector(self, text):
+        import numpy as np
+
+        seed = int(hashlib.md5(text.encode()).hexdigest(), 16) % 2**32
+        vector = np.random.default_rng(seed).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vector(text)
+
+
+def open_benchmark_store(backend, path, dim, dtype="float32"):
+    embedding = FixtureEmbeddings(dim)
+    if backend == "chroma":
+        from chromadb.config import Settings
+        from langchain_community.vectorstores import Chroma
+
+        return Chroma(
+            persist_directory=path,
+            embedding_function=embedding,
+            collection_name="benchmark",
+            client_settings=Settings(anonymized_telemetry=False, is_persistent=True),
+        )
+    from numpy_store import NumpyVectorStore
+
+    return NumpyVectorStore(embedding, path=path, dtype=dtype)
+
+
+def bench_vectorstore(args):
+    """Load time, query latency and memory of Chroma vs the NumPy store."""
+    import tempfile
+
+    import chunker
+
+    backends = [("chroma", "float32")] + [("numpy", dtype) for dtype in args.dtypes]
+    texts = [f"Chunk {idx} about our services." for idx in range(args.chunks)]
+    with tempfile.TemporaryDirectory() as folder:
+        for backend, dtype in backends:
+            path = os.path.join(folder, f"{backend}-{dtype}")
+            store = open_benchmark_store(backend, path, args.dim, dtype)
+            started = time.perf_counter()
+            for batch in chunker.batched(enumerate(texts), 1000):
+                store.add_texts(
+                    [text for _, text in batch],
+                    [{"id": str(idx)} for idx, _ in batch],
+                    ids=[str(idx) for idx, _ in batch],
+                )
+            build_seconds = time.perf_counter() - started
+            del store
+
+            # Probes query one at a time, then report memory while all of
+            # them have the store open, so shared pages show up in PSS.
+            probes = []
+            results = []
+            for _ in range(args.processes):
+                probe = subprocess.Popen(
+                    probe_command(
+                        "vectorstore-probe",
+                        backend,
+                        path,
+                        str(args.dim),
+                        dtype,
+                        str(args.queries),
+                    ),
+                    env=probe_env(),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                )
+                # Log lines share stdout with the result.
+                line = probe.stdout.readline()
+                while not line.startswith("{"):
+                    line = probe.stdout.readline()
+                results.append(json.loads(line))
+                probes.append(probe)
+            for probe, result in zip(probes, results):
+                output = probe.communicate("measure\n")[0]
+                result.update(json.loads(output.splitlines()[-1]))
+
+            disk_mb = sum(
+                os.path.getsize(os.path.join(root, file_name))
+                for root, _, file_names in os.walk(path)
+                for file_name in file_names
+            )
+            report(
+                "vectorstore",
+                backend=backend,
+                dtype=dtype,
+                chunks=args.chunks,
+                dim=args.dim,
+                processes=args.processes,
+                build_s=round(build_seconds, 2),
+                disk_mb=round(disk_mb / 1024 / 1024, 1),
+                **{
+                    key: round(mean(result[key] for result in results), 2)
+                    for key in results[0]
+                },
+            )
+
+
+def bench_vectorstore_probe(args):
+    """Opens and queries one store; run in fresh processes by `vectorstore`."""
+    import numpy as np
+
+    if args.backend == "chroma":
+        from langchain_community.vectorstores import Chroma  # noqa: F401
+    else:
+        import numpy_store  # noqa: F401
+
+    baseline_rss = current_rss_mb()
+    baseline_pss = current_pss_mb()
+    rng = np.random.default_rng(5)
+    queries = rng.standard_normal((args.queries, args.dim))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    started = time.perf_counter()
+    store = open_benchmark_store(args.backend, args.path, args.dim, args.dtype)
+    store.similarity_search_by_vector(queries[0].tolist(), k=4)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for query in queries[1:]:
+        started = time.perf_counter()
+        store.similarity_search_by_vector(query.tolist(), k=4)
+        latencies.append(time.perf_counter() - started)
+    result = {
+        "load_ms": load_ms,
+        "query_p50_ms": percentile(latencies, 50) * 1000,
+        "query_p95_ms": percentile(latencies, 95) * 1000,
+    }
+    print(json.dumps(result), flush=True)
+
+    sys.stdin.readline()
+    result = {"rss_delta_mb": current_rss_mb() - baseline_rss}
+    if baseline_pss is not None:
+        result["pss_delta_mb"] = current_pss_mb() - baseline_pss
+    print(json.dumps(result))
+
+
+def add_parsers(subparsers):
+    vectorstore = subparsers.add_parser("vectorstore", help=bench_vectorstore.__doc__)
+    vectorstore.add_argument("--chunks", type=int, default=20000)
+    vectorstore.add_argument("--dim", type=int, default=768)
+    vectorstore.add_argument("--queries", type=int, default=200)
+    vectorstore.add_argument(
+        "--processes", type=int, default=2, help="Worker processes opening the store."
+    )
+    vectorstore.add_argument(
+        "--dtypes", nargs="+", default=["float32", "float16", "int8"]
+    )
+    vectorstore.set_defaults(func=bench_vectorstore)
+    vectorstore_probe = subparsers.add_parser("vectorstore-probe")
+    vectorstore_probe.add_argument("backend")
+    vectorstore_probe.add_argument("path")
+    vectorstore_probe.add_argument("dim", type=int)
+    vectorstore_probe.add_argument("dtype")
+    vectorstore_probe.add_argument("queries", type=int)
+    vectorstore_probe.set_defaults(func=bench_vectorstore_probe)
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+from benchmarks.common import percentile, report
+
+
+def tone_wav(frequency, seconds=1.0, sample_rate=16000):
+    import wave
+    from io import BytesIO
+
+    import numpy as np
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (np.sin(2 * np.pi * frequency * t) * 16000).astype(np.int16)
+    buffer = BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def bench_audio(args):
+    """Concurrent in-memory audio decoding: session isolation and latency."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+    from audio import decode_pcm, encode
+
+    frequencies = [220 + 20 * idx for idx in range(args.sessions)]
+    inputs = [tone_wav(frequency) for frequency in frequencies]
+
+    def session(idx):
+        started = time.perf_counter()
+        samples = decode_pcm(inputs[idx])
+        decoded = time.perf_counter() - started
+        encode(inputs[idx], "webm")
+        # Every session must get back its own tone, not another session's.
+        spectrum = np.abs(np.fft.rfft(samples))
+        peak = np.argmax(spectrum) * 16000 / len(samples)
+        return abs(peak - frequencies[idx]) < 2, decoded, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        results = list(executor.map(session, range(args.sessions)))
+
+    decode_latencies = [decoded for _, decoded, _ in results]
+    round_trips = [total for _, _, total in results]
+    report(
+        "audio",
+        sessions=args.sessions,
+        isolated=all(ok for ok, _, _ in results),
+        decode_p50_ms=round(percentile(decode_latencies, 50) * 1000, 1),
+        decode_p95_ms=round(percentile(decode_latencies, 95) * 1000, 1),
+        round_trip_p95_ms=round(percentile(round_trips, 95) * 1000, 1),
+    )
+
+
+def bench_tts(args):
+    """Time to first audio for whole-answer vs sentence-streaming speech."""
+    from benchmarks.fake_ollama import FakeOllama
+    from langchain_community.llms import Ollama
+    from tts import BACKENDS, SentenceSpeaker, TTSBackend
+
+    class SimulatedTTS(TTSBackend):
+        # Synthesis cost grows with the text, like a real engine.
+        def synthesize(self, text, mime_type):
+            time.sleep(args.tts_latency * len(text))
+            return tone_wav(440, seconds=len(text) / 15)
+
+    backend = BACKENDS[args.backend]() if args.backend else SimulatedTTS()
+    answer = " ".join(
+        f"This is sentence number {idx} of a spoken answer about our services."
+        for idx in range(1, args.sentences + 1)
+    )
+
+    async def full(llm):
+        started = time.perf_counter()
+        text = ""
+        async for token in llm.astream("question"):
+            text += token
+        await asyncio.to_thread(backend.synthesize, text, "audio/wav")
+        return time.perf_counter() - started
+
+    async def streaming(llm):
+        started = time.perf_counter()
+        first_audio = []
+
+        async def send(audio, index):
+            if not first_audio:
+                first_audio.append(time.perf_counter() - started)
+
+        speaker = SentenceSpeaker(send, "audio/wav", backend)
+        async for token in llm.astream("question"):
+            speaker.feed(token)
+        await speaker.finish()
+        return first_audio[0]
+
+    with FakeOllama(token_latency=args.token_latency, answer=answer) as fake:
+        llm = Ollama(base_url=fake.url, model="fake")
+        for mode, run in (("full", full), ("streaming", streaming)):
+            report(
+                "tts",
+                mode=mode,
+                backend=args.backend or "simulated",
+                time_to_first_audio_ms=round(asyncio.run(run(llm)) * 1000, 1),
+            )
+
+
+def add_parsers(subparsers):
+    audio = subparsers.add_parser("audio", help=bench_audio.__doc__)
+    audio.add_argument("--sessions", type=int, default=16)
+    audio.set_defaults(func=bench_audio)
+
+    tts = subparsers.add_parser("tts", help=bench_tts.__doc__)
+    tts.add_argument("--sentences", type=int, default=6)
+    tts.add_argument("--backend", choices=["gtts", "pyttsx3"])
+    tts.add_argument(
+        "--token-latency",
+        type=float,
+        default=0.03,
+        help="Fake server seconds per generated token.",
+    )
+    tts.add_argument(
+        "--tts-latency",
+        type=float,
+        default=0.002,
+        help="Simulated backend seconds per character.",
+    )
+    tts.set_defaults(func=bench_tts)
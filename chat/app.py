@@ -1,109 +1,190 @@
+import asyncio
+import hmac
 import logging
 import os
-import sqlite3
+import re
+import time
 import uuid
 from io import BytesIO
 
 import chainlit as cl
 import config
+import metrics
 
-import speech_recognition as sr
-import whisper
+from async_timeout import timeout
+from audio import output_format
 from chainlit.element import ElementBased
-from gtts import gTTS
+from chainlit.server import app as server
+from history import ChatHistoryStore
 from langchain.schema.runnable import Runnable
 from langchain.schema.runnable.config import RunnableConfig
 from logs import configure_logging
-from pydub import AudioSegment
-from pydub.utils import which
-from rag import Rag
+from memory import ConversationMemory
+from rag import get_rag
+from scheduler import GenerationScheduler, QueueTimeout
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from transcription import TranscriptionPool
+from tts import SentenceSpeaker, get_backend
 
-whisper_model = whisper.load_model("base")
-AudioSegment.converter = which("ffmpeg")
-temp_audio_path = "temp_audio.wav"
+configure_logging()
+transcriber = TranscriptionPool()
+tts_backend = get_backend()
+history = ChatHistoryStore(os.path.join(config.database_path, "database.db"))
+scheduler = GenerationScheduler()
+
+
+async def metrics_endpoint(request: Request):
+    # Series are labelled with conversation ids, so scrapers must authenticate.
+    authorization = request.headers.get("authorization", "")
+    expected = f"Bearer {config.metrics_token}"
+    if not hmac.compare_digest(authorization.encode(), expected.encode()):
+        return PlainTextResponse("Unauthorized", status_code=401)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-async def save_chat(conversation_id, message_content, role):
-    try:
-        con = sqlite3.connect(config.database_path + "/database.db")
-        cur = con.cursor()
-        cur.execute(
-            "INSERT INTO chat_history (conversation_id, message_content, role) VALUES (?, ?, ?);",
-            (conversation_id, message_content, role),
-        )
-        con.commit()
-        cur.close()  
-    except sqlite3.Error as e:
-        logging.error(f"An error occurred: {e}")
-    finally:
-        con.close()
+
+if config.metrics_token:
+    server.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+    # Chainlit serves its frontend from a catch-all route; ours must come first.
+    routes = server.router.routes
+    route = next(
+        route for route in routes if getattr(route, "path", None) == "/metrics"
+    )
+    routes.remove(route)
+    routes.insert(0, route)
 
 
 @cl.step(type="tool")
 async def speech_to_text(audio_file):
-    recognizer = sr.Recognizer()
-    audio = BytesIO(audio_file)
-    
-    
     try:
-      
-       
-        audio.seek(0)
-        audio_segment = AudioSegment.from_file(audio)
-        audio_segment.export(temp_audio_path, format="wav")
-
-        audio_data = sr.AudioFile(temp_audio_path)
-        with audio_data as source:
-            audio_data = recognizer.record(source)
-
-        result = whisper_model.transcribe(temp_audio_path, fp16=False)
-        print(result)
-
-        
-
-        return result["text"]
-    except sr.UnknownValueError:
-        return "Sorry, I could not understand the audio."
-    except sr.RequestError as e:
-        return f"Could not request results from Google Speech Recognition service; {e}"
+        return await transcriber.transcribe(audio_file)
     except Exception as e:
         return f"An error occurred while processing the audio: {e}"
-    # finally:
-    #     if os.path.exists(temp_audio_path):
-    #         os.remove(temp_audio_path)
 
 
 @cl.step(type="tool")
 async def text_to_speech(text: str, mime_type: str):
-    tts = gTTS(text)
-    output_buffer = BytesIO()
-    tts.save("output_audio.mp3")
+    with metrics.tts_seconds.time():
+        output_audio = await cl.make_async(tts_backend.synthesize)(text, mime_type)
+    return f"output_audio.{output_format(mime_type)}", output_audio
+
+
+BUSY_MESSAGE = (
+    "Sorry, too many people are asking questions right now. "
+    "Please try again in a moment."
+)
+CUT_SHORT_MESSAGE = "\n\nSorry, this answer took too long and was cut short."
+
+
+async def stream_text(text, msg, on_token=None):
+    for token in re.findall(r"\S+\s*", text):
+        await msg.stream_token(token)
+        if on_token:
+            on_token(token)
+
+
+class QueueStatus:
+    """A message showing the user's place in line while they wait."""
+
+    def __init__(self):
+        self.msg = None
+
+    async def show(self, position):
+        content = f"Waiting for a free slot: you are number {position} in line."
+        if self.msg is None:
+            self.msg = cl.Message(content=content)
+            await self.msg.send()
+        else:
+            self.msg.content = content
+            await self.msg.update()
+
+    async def clear(self):
+        if self.msg is not None:
+            await self.msg.remove()
+            self.msg = None
+
 
-    audio = AudioSegment.from_file("output_audio.mp3")
-    output_buffer = BytesIO()
-    audio.export(output_buffer, format=mime_type.split("/")[1])
-    output_buffer.seek(0)
+async def generate(rag, question, chat_history, msg, on_token=None):
+    res = ""
+    started = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    try:
+        async with timeout(config.generation_timeout):
+            async for chunk in rag.chain.astream(
+                {
+                    "chat_history": chat_history,
+                    "question": question,
+                },
+                config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
+            ):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.time_to_first_token.observe(first_token_at - started)
+                tokens += 1
+                await msg.stream_token(chunk)
+                if on_token:
+                    on_token(chunk)
+                res += chunk
+    except asyncio.TimeoutError:
+        logging.error(f"Generation timed out after {config.generation_timeout}s")
+        await stream_text(CUT_SHORT_MESSAGE, msg, on_token)
+        return res + CUT_SHORT_MESSAGE
+    if tokens > 1:
+        elapsed = time.perf_counter() - first_token_at
+        metrics.tokens_per_second.observe((tokens - 1) / elapsed)
+    await cl.make_async(rag.store_answer)(question, chat_history, res)
+    return res
+
+
+async def answer(question, chat_history, msg, on_token=None):
+    """Streams the answer to `question` into `msg` and returns its text.
 
-    os.remove("output_audio.mp3")
+    Near-duplicate questions are served from the answer cache when enabled,
+    still token by token so the UI behaves the same. Otherwise the question
+    waits for a generation slot, seeing its place in line. `on_token` is
+    called with every streamed token.
+    """
+    rag = get_rag()
+    cached = await cl.make_async(rag.cached_answer)(question, chat_history)
+    if cached is not None:
+        logging.info(f"Answer cache hit: {rag.cache_stats()['answers']}")
+        await stream_text(cached, msg, on_token)
+        return cached
 
-    return "output_audio.mp3", output_buffer.read()
+    status = QueueStatus()
+    try:
+        async with scheduler.slot(cl.user_session.get("conversation_id"), status.show):
+            await status.clear()
+            return await generate(rag, question, chat_history, msg, on_token)
+    except QueueTimeout:
+        logging.error("No generation slot freed up before the queue deadline")
+        await status.clear()
+        await stream_text(BUSY_MESSAGE, msg, on_token)
+        return BUSY_MESSAGE
 
 
 @cl.on_chat_start
 async def start():
-    configure_logging()
     try:
-        cl.user_session.set("chain", Rag().chain)
-        cl.user_session.set("chat_history", "")
+        await cl.make_async(get_rag)()
+        cl.user_session.set("memory", ConversationMemory())
         conversation_id = str(uuid.uuid4())
         cl.user_session.set("conversation_id", conversation_id)
+        metrics.conversation_id.set(conversation_id)
         system_prompt = config.base_prompt + config.custom_prompt
         logging.info(f"System: {system_prompt}")
-        await save_chat(conversation_id, system_prompt, "system")
+        await history.save(conversation_id, system_prompt, "system")
     except Exception as e:
         logging.error(f"Error during chat start: {e}")
 
 
-@cl.on_audio_chunk
+@cl.on_chat_end
+async def end():
+    # Stop queued or running generations of users who have left.
+    scheduler.cancel(cl.user_session.get("conversation_id"))
+
+
 async def on_audio_chunk(chunk: cl.AudioChunk):
     if chunk.isStart:
         buffer = BytesIO()
@@ -114,72 +195,76 @@ async def on_audio_chunk(chunk: cl.AudioChunk):
     cl.user_session.get("audio_buffer").write(chunk.data)
 
 
-@cl.on_audio_end
 async def on_audio_end(elements: list[ElementBased]):
-    chain = cl.user_session.get("chain")
-    chat_history = cl.user_session.get("chat_history")
+    metrics.conversation_id.set(cl.user_session.get("conversation_id"))
+    memory = cl.user_session.get("memory")
     audio_buffer: BytesIO = cl.user_session.get("audio_buffer")
     audio_buffer.seek(0)
     audio_file = audio_buffer.read()
     audio_mime_type: str = cl.user_session.get("audio_mime_type")
-    res = ""
     transcription = await speech_to_text(audio_file)
     await cl.Message(author="You", type="user_message", content=transcription).send()
-    if os.path.exists(temp_audio_path):
-        os.remove(temp_audio_path)
     msg = await cl.Message(content="").send()
-    
-    async for chunk in chain.astream(
-        {
-            "chat_history": chat_history,
-            "question": transcription,
-        },
-        config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
-    ):
-        await msg.stream_token(chunk)
-        res += chunk
-    await msg.send()
+    if config.streaming_tts:
+
+        async def send_audio(audio, index):
+            await cl.Audio(
+                name=f"output_audio_{index}.{output_format(audio_mime_type)}",
+                auto_play=True,
+                mime=audio_mime_type,
+                content=audio,
+            ).send(for_id=msg.id)
+
+        speaker = SentenceSpeaker(send_audio, audio_mime_type, tts_backend)
+        try:
+            res = await answer(transcription, memory.render(), msg, speaker.feed)
+            await msg.send()
+            await speaker.finish()
+        finally:
+            # Cancelled when the session ends; stop synthesizing for it.
+            speaker.close()
+    else:
+        res = await answer(transcription, memory.render(), msg)
+        await msg.send()
+        output_name, output_audio = await text_to_speech(res, audio_mime_type)
+        output_audio_el = cl.Audio(
+            name=output_name,
+            auto_play=True,
+            mime=audio_mime_type,
+            content=output_audio,
+        )
+        msg.elements = [output_audio_el]
+        await msg.update()
     logging.info(f"AI: {res}")
-    output_name, output_audio = await text_to_speech(res, audio_mime_type)
-    output_audio_el = cl.Audio(
-        name=output_name,
-        auto_play=True,
-        mime=audio_mime_type,
-        content=output_audio,
-    )
-    chat_history += f"Human: {transcription}\nAI: {res}\n"
-    cl.user_session.set("chat_history", chat_history)
-    msg.elements = [output_audio_el]
-    await msg.update()
+    memory.add(transcription, res)
     conversation_id = cl.user_session.get("conversation_id")
-    await save_chat(conversation_id, transcription, "user")
-    await save_chat(conversation_id, res, "assistant")
+    await history.save(conversation_id, transcription, "user")
+    await history.save(conversation_id, res, "assistant")
     cl.user_session.set("audio_buffer", None)
     cl.user_session.set("audio_mime_type", None)
 
 
+# The audio stack is imported and loaded on first use. Text-only
+# deployments turn voice off and never pay for it.
+if config.voice_enabled:
+    cl.on_audio_chunk(on_audio_chunk)
+    cl.on_audio_end(on_audio_end)
+    if config.voice_warmup:
+        transcriber.warm_up()
+
+
 @cl.on_message
 async def main(message):
-    chain = cl.user_session.get("chain")
-    chat_history = cl.user_session.get("chat_history")
-    res = ""
+    metrics.conversation_id.set(cl.user_session.get("conversation_id"))
+    memory = cl.user_session.get("memory")
     message_content = message.content.strip().lower()
     logging.info(f"User: {message_content}")
     msg = cl.Message(content="")
-    async for chunk in chain.astream(
-        {
-            "chat_history": chat_history,
-            "question": message_content,
-        },
-        config=RunnableConfig(callbacks=[cl.LangchainCallbackHandler()]),
-    ):
-        await msg.stream_token(chunk)
-        res += chunk
+    res = await answer(message_content, memory.render(), msg)
     await msg.send()
     logging.info(f"AI: {res}")
 
-    chat_history += f"Human: {message_content}\nAI: {res}\n"
-    cl.user_session.set("chat_history", chat_history)
+    memory.add(message_content, res)
     conversation_id = cl.user_session.get("conversation_id")
-    await save_chat(conversation_id, message_content, "user")
-    await save_chat(conversation_id, res, "assistant")
\ No newline at end of file
+    await history.save(conversation_id, message_content, "user")
+    await history.save(conversation_id, res, "assistant")
\ No newline at end of file
@@ -0,0 +1,116 @@
+import subprocess
+import wave
+from io import BytesIO
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FORMATS = {"mpeg": "mp3", "mp3": "mp3", "webm": "webm", "wav": "wav", "ogg": "ogg"}
+# Layer III kbps by bitrate index, for MPEG-2 and 2.5 (False) and MPEG-1 (True).
+MP3_BITRATES = {
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+}
+# Hz by version bits (MPEG-2.5, reserved, MPEG-2, MPEG-1) and rate index.
+MP3_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+def ffmpeg(audio_bytes, *output_args):
+    """Pipes audio through ffmpeg, from stdin to stdout, without temp files."""
+    process = subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", *output_args, "pipe:1"],
+        input=audio_bytes,
+        capture_output=True,
+        check=False,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {process.stderr.decode().strip()}")
+    return process.stdout
+
+
+def decode_pcm(audio_bytes, sample_rate=SAMPLE_RATE):
+    """Decodes any ffmpeg-readable audio into mono float32 PCM for Whisper."""
+    pcm = ffmpeg(audio_bytes, "-f", "s16le", "-ac", "1", "-ar", str(sample_rate))
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def output_format(mime_type):
+    return FORMATS.get(mime_type.split("/")[1], "mp3")
+
+
+def encode(audio_bytes, audio_format, input_format="mp3"):
+    if audio_format == input_format:
+        return audio_bytes
+    return ffmpeg(audio_bytes, "-f", audio_format)
+
+
+def mp3_duration(data):
+    """Length of MPEG Layer III audio from its frame headers, or None if the
+    data is not a stream of them."""
+    position = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = 0
+        for byte in data[6:10]:
+            size = size << 7 | byte & 0x7F
+        position = 10 + size + (10 if data[5] & 0x10 else 0)
+    samples = 0
+    sample_rate = None
+    while position + 4 <= len(data):
+        b1, b2, b3 = data[position + 1 : position + 4]
+        if data[position] != 0xFF or b1 & 0xE0 != 0xE0:
+            break
+        version = b1 >> 3 & 3
+        bitrate_index = b2 >> 4
+        rate_index = b2 >> 2 & 3
+        if version == 1 or b1 >> 1 & 3 != 1 or rate_index == 3:
+            break
+        if bitrate_index in (0, 15):
+            break
+        mpeg1 = version == 3
+        bitrate = MP3_BITRATES[mpeg1][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        frame_samples = 1152 if mpeg1 else 576
+        samples += frame_samples
+        position += frame_samples // 8 * bitrate // sample_rate + (b2 >> 1 & 1)
+    return samples / sample_rate if samples else None
+
+
+def wav_duration(data):
+    try:
+        with wave.open(BytesIO(data), "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def duration(audio_bytes, audio_format=None):
+    """Playback length of encoded audio in seconds.
+
+    Read from the MP3 frame or WAV headers when `audio_format` is one of
+    those; other formats are decoded with ffmpeg.
+    """
+    seconds = None
+    if audio_format == "mp3":
+        seconds = mp3_duration(audio_bytes)
+    elif audio_format == "wav":
+        seconds = wav_duration(audio_bytes)
+    if seconds is None:
+        seconds = len(decode_pcm(audio_bytes)) / SAMPLE_RATE
+    return seconds
+
+
+def gtts_mp3(text):
+    from gtts import gTTS
+
+    mp3 = BytesIO()
+    gTTS(text).write_to_fp(mp3)
+    return mp3.getvalue()
+
+
+def synthesize(text, mime_type):
+    """Speaks `text` with gTTS and encodes it for `mime_type` in memory."""
+    return encode(gtts_mp3(text), output_format(mime_type))
@@ -1,27 +1,113 @@
 import logging
 import os
 import sqlite3
-from time import sleep
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from urllib.parse import urljoin, urlparse
 
 import config
 import requests
 import tldextract
 from bs4 import BeautifulSoup
-from langchain.chains.summarize import load_summarize_chain
-from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain_core.documents import Document
+from chunker import metadata_header
+from extract import SiteExtractor
+from history import create_schema
 from logs import configure_logging
+from page_store import PageStore, page_id
+from pipeline import bounded_map
 from PyPDF2 import PdfReader
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from summarize import Summarizer
 from webdriver_manager.chrome import ChromeDriverManager
 
 
+pdf_reader = None
+# Responses parsed for text and links; anything else is skipped.
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+
+def open_pdf(pdf_path):
+    """Opens the PDF once per worker process.
+
+    PdfReader reads a path into memory whole, but reads an open file lazily,
+    so workers only hold the objects of the pages they extract. The file
+    stays open for the life of the worker.
+    """
+    global pdf_reader
+    pdf_reader = PdfReader(open(pdf_path, "rb"))
+
+
+def extract_pdf_pages(page_range):
+    """Extracts the text of pages [start, stop); runs in a worker process."""
+    start, stop = page_range
+    return [
+        pdf_reader.pages[number].extract_text() or "" for number in range(start, stop)
+    ]
+
+
+def iter_pdf_pages(
+    pdf_path, workers=config.pdf_workers, pages_per_task=config.pdf_pages_per_task
+):
+    """Yields the text of every page of a PDF, in order.
+
+    Page ranges are extracted in a process pool and only a few ranges are
+    read ahead of the consumer, so memory stays bounded for large files.
+    """
+    with open(pdf_path, "rb") as file:
+        page_count = len(PdfReader(file).pages)
+    page_ranges = (
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=open_pdf, initargs=(pdf_path,)
+    ) as executor:
+        for pages in bounded_map(
+            executor, extract_pdf_pages, page_ranges, workers * 2
+        ):
+            yield from pages
+
+
+class HostLimiter:
+    """Per-host politeness: bounded parallelism and a minimum request interval."""
+
+    def __init__(self, per_host=config.crawl_per_host, delay=config.crawl_delay):
+        self.per_host = per_host
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def host(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = [threading.Semaphore(self.per_host), 0.0]
+            return self.hosts[host]
+
+    def acquire(self, url):
+        state = self.host(url)
+        state[0].acquire()
+        with self.lock:
+            next_slot = max(time.monotonic(), state[1] + self.delay)
+            state[1] = next_slot
+        time.sleep(max(0.0, next_slot - time.monotonic()))
+
+    def release(self, url):
+        self.host(url)[0].release()
+
+
 class WebScraper:
     def __init__(self, base_url):
         self.base_url = base_url
@@ -29,6 +115,9 @@ class WebScraper:
         self.pdf_urls = set()
         self.visited = set()
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=config.crawl_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.domain = self.extract_domain(base_url)
         self.session.headers.update(
             {
@@ -37,10 +126,11 @@ class WebScraper:
         )
         self.pdf_reader = os.getenv("PDF_READER", "false")
         self.ignore_keywords = config.url_ignire_list.split(", ")
-        self.service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(
-            service=self.service, options=self.set_chrome_options()
-        )
+        self.limiter = HostLimiter()
+        self.store = PageStore()
+        self.summarizer = Summarizer()
+        self.driver = None
+        self.driver_lock = threading.Lock()
         logging.info(f"Initialized WebScraper for domain: {self.domain}")
 
     def extract_domain(self, url):
@@ -62,50 +152,27 @@ class WebScraper:
         logging.info(f"Sorted URLs: {self.urls}")
 
     def crawl_urls(self):
-        queue = [self.base_url]
-        while queue:
-            current_url = queue.pop(0)
-            if current_url in self.visited:
-                continue
-            self.visited.add(current_url)
-            logging.info(f"Visiting URL: {current_url}")
-
-            response = self.fetch_url(current_url)
-            if response:
-                soup = BeautifulSoup(response, "lxml")
-                for link in soup.find_all("a", href=True):
-                    self.process_link(link["href"], current_url, queue)
-
-                # while True:
-                #     try:
-                #         next_button = self.driver.find_element(
-                #             By.XPATH, '//*[@id="pagination-next"]'
-                #         )
-                #         if next_button.is_enabled():
-                #             next_button.click()
-                #             sleep(config.page_load_timeout)
-                #             next_page_content = self.driver.page_source
-                #             logging.info("Clicked next pagination button")
-                #             next_soup = BeautifulSoup(next_page_content, "lxml")
-                #             for link in next_soup.find_all("a", href=True):
-                #                 self.process_link(
-                #                     link["href"], self.driver.current_url, queue
-                #                 )
-                #         else:
-                #             logging.info(
-                #                 "Pagination button is disabled, stopping pagination."
-                #             )
-                #             break
-                #     except NoSuchElementException:
-                #         logging.info(
-                #             "Pagination button not found, stopping pagination."
-                #         )
-                #         break
-                #     except Exception as e:
-                #         logging.error(
-                #             f"Error clicking pagination button: {e}", exc_info=True
-                #         )
-                #         break
+        """Breadth-first crawl with a pool of concurrent fetchers."""
+        frontier = deque([self.base_url])
+        self.visited.add(self.base_url)
+        in_flight = {}
+        with ThreadPoolExecutor(
+            max_workers=config.crawl_concurrency, thread_name_prefix="crawl"
+        ) as executor:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < config.crawl_concurrency:
+                    url = frontier.popleft()
+                    logging.info(f"Visiting URL: {url}")
+                    in_flight[executor.submit(self.fetch_url, url)] = url
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current_url = in_flight.pop(future)
+                    response = future.result()
+                    if response:
+                        soup = BeautifulSoup(response, "lxml")
+                        for link in soup.find_all("a", href=True):
+                            self.process_link(link["href"], current_url, frontier)
 
     def set_chrome_options(self) -> Options:
         chrome_options = Options()
@@ -115,27 +182,111 @@ class WebScraper:
         logging.info("Set Chrome options for headless browsing")
         return chrome_options
 
+    def get_driver(self):
+        if self.driver is None:
+            service = Service(ChromeDriverManager().install())
+            self.driver = webdriver.Chrome(
+                service=service, options=self.set_chrome_options()
+            )
+        return self.driver
+
+    def needs_browser(self, html):
+        """Pages with almost no text without JavaScript are rendered in Chrome."""
+        body = BeautifulSoup(html, "lxml").find("body")
+        text = body.get_text(" ", strip=True) if body else ""
+        return len(text) < config.min_page_text
+
+    def network_idle(self, idle_time=config.render_idle_time):
+        """Wait condition: the document has loaded and no request has
+        finished for `idle_time` seconds, so scripts are done fetching."""
+        last = {"count": None, "since": time.monotonic()}
+
+        def condition(driver):
+            ready, count = driver.execute_script(
+                "return [document.readyState,"
+                " performance.getEntriesByType('resource').length]"
+            )
+            now = time.monotonic()
+            if ready != "complete" or count != last["count"]:
+                last.update(count=count, since=now)
+                return False
+            return now - last["since"] >= idle_time
+
+        return condition
+
+    def fetch_with_browser(self, url):
+        with self.driver_lock:
+            driver = self.get_driver()
+            driver.get(url)
+            try:
+                WebDriverWait(
+                    driver, config.page_load_timeout, poll_frequency=0.1
+                ).until(self.network_idle())
+            except TimeoutException:
+                logging.info(f"Timed out waiting for {url} to finish loading")
+            return driver.page_source
+
     def fetch_url(self, url):
+        """Fetches a page into the page store and returns its HTML.
+
+        Pages crawled before are requested conditionally and read back from
+        the store when the server answers 304 Not Modified.
+        """
+        self.limiter.acquire(url)
         try:
-            self.driver.get(url)
-            sleep(config.page_load_timeout)
-            html_content = self.driver.page_source
+            # Streamed, so the body of a response that is skipped is never read.
+            with self.session.get(
+                url,
+                headers=self.store.conditional_headers(url),
+                timeout=config.request_timeout,
+                stream=True,
+            ) as response:
+                if response.status_code == 304:
+                    logging.info(f"Unchanged URL: {url}")
+                    self.store.mark_unchanged(url)
+                    return self.store.read(url)
+                response.raise_for_status()
+                content_type = response.headers.get("Content-Type", "")
+                content_type = content_type.split(";")[0].strip().lower()
+                if content_type not in HTML_TYPES:
+                    if content_type == "application/pdf" and self.pdf_reader != "false":
+                        self.pdf_urls.add(url)
+                    logging.info(f"Skipping {content_type or 'untyped'} URL: {url}")
+                    return None
+                html_content = response.text
+            if self.needs_browser(html_content):
+                logging.info(f"Rendering URL with browser: {url}")
+                html_content = self.fetch_with_browser(url)
+            self.store.put(
+                url,
+                html_content,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
             logging.info(f"Fetched URL: {url}")
             return html_content
         except Exception as e:
             logging.error(f"Error fetching URL {url}: {e}")
+            if url in self.store.index:
+                # Keep the last good copy rather than dropping the page.
+                self.store.mark_unchanged(url)
+                return self.store.read(url)
             return None
+        finally:
+            self.limiter.release(url)
 
     def process_link(self, href, current_url, queue):
         full_url = urljoin(current_url, href)
-        if self.is_valid_url(full_url):
-            if href.lower().endswith(".pdf") and self.pdf_reader != "false":
-                self.pdf_urls.add(full_url)
-                logging.info(f"Found PDF URL: {full_url}")
-            elif self.extract_domain(full_url) == self.domain:
-                logging.info(f"Found URL: {full_url}")
-                queue.append(full_url)
-                self.urls.add(full_url)
+        if full_url in self.visited or not self.is_valid_url(full_url):
+            return
+        if href.lower().endswith(".pdf") and self.pdf_reader != "false":
+            self.pdf_urls.add(full_url)
+            logging.info(f"Found PDF URL: {full_url}")
+        elif self.extract_domain(full_url) == self.domain:
+            logging.info(f"Found URL: {full_url}")
+            queue.append(full_url)
+            self.urls.add(full_url)
+            self.visited.add(full_url)
 
     def is_valid_url(self, url):
         parsed_url = urlparse(url)
@@ -143,189 +294,177 @@ class WebScraper:
             return False
         if any(kw in url.lower() for kw in ["#", "javascript:", "mailto:", "tel:"]):
             return False
-        if ":" in url.split("/")[2]:  # check for a port in the host part
+        try:
+            if parsed_url.port != urlparse(self.base_url).port:
+                return False
+        except ValueError:
             return False
         return True
 
     def download_pdf(self, url):
+        file_name = os.path.basename(url)
+        file_path = os.path.join(config.base_storage_path, "pdf", file_name)
+        tmp_path = file_path + ".part"
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            file_name = os.path.basename(url)
-            file_path = os.path.join(config.base_storage_path, "pdf", file_name)
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "wb") as f:
-                f.write(response.content)
+            with self.session.get(
+                url, stream=True, timeout=config.request_timeout
+            ) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for block in response.iter_content(config.download_chunk_size):
+                        f.write(block)
+            os.replace(tmp_path, file_path)
             logging.info(f"Downloaded PDF: {file_name}")
             return file_path
-        except requests.RequestException as e:
+        except (requests.RequestException, OSError) as e:
             logging.error(f"Error downloading PDF from {url}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return None
 
-    def summarizer(self, text, type):
-        document = Document(page_content=text)
-
-        llm = Ollama(
-            base_url=config.ollama_server,
-            model=config.model_name,
-            temperature=0.8,
-            num_ctx=8192,
-        )
-        prompt_template = """Write a concise contextualized text in first-person plural of the following:
-        {text}
-        CONCISE CONTEXTUALIZED TEXT:"""
-        prompt = PromptTemplate.from_template(prompt_template)
-        refine_template = """
-         "Your job is to produce a final contextualized text in first-person plural\n"
-    "We have provided an existing contextualized text up to a certain point: {existing_answer}\n"
-    "We have the opportunity to refine the existing contextualized text"
-    "(only if needed) with some more context below.\n"
-    "------------\n"
-    "{text}\n"
-    "------------\n"
-    "Given the new context, refine the original contextualized text"
-    "If the context isn't useful, return the original contextualized text.
-    REFINED CONTEXTUALIZED TEXT:"
-        """
-        refine_prompt = PromptTemplate(
-            template=refine_template, input_variables=["text", "existing_answer"]
-        )
-        if type == "refine":
-            chain = load_summarize_chain(
-                llm,
-                chain_type=type,
-                refine_prompt=refine_prompt,
-                question_prompt=prompt,
-            )
-        else:
-            chain = load_summarize_chain(llm, chain_type=type)
-
-        summary = chain.invoke(dict(input_documents=[document]))
-        logging.info(f"Summarized text with type '{type}'")
-        return summary["output_text"]
+    def page_files(self, page):
+        return [
+            os.path.join(config.data_path, file_name)
+            for file_name in os.listdir(config.data_path)
+            if file_name.startswith((f"data_{page}", f"data_summarized_{page}"))
+        ]
 
     def create_txt(self):
-        self.urls.update(config.extra_urls.split(", "))
+        """Extracts the stored pages into text files for the chunker.
+
+        Boilerplate is written once to boilerplate.txt and near-duplicate
+        pages are dropped. Each page's text is streamed to the summarizer as
+        it is written, and pages whose text did not change are skipped.
+        """
+        urls = list(self.urls)
+        urls += [
+            url for url in config.extra_urls.split(", ") if url and url not in urls
+        ]
         logging.info("Creating text files from scraped content...")
-        content_header = ""
-        content_footer = ""
-        for idx, url in enumerate(self.urls):
-            response = self.fetch_url(url)
-            if response:
-                soup = BeautifulSoup(response, "lxml")
-                main_content = soup.find("main")
-                if idx == 0:
-                    header = soup.find("header")
-                    if header:
-                        content_header = header.get_text("\n")
-                        self.write_to_file(
-                            content_header,
-                            os.path.join(config.data_path, f"header.txt"),
-                        )
-                    footer = soup.find("footer")
-                    if footer:
-                        content_footer = footer.get_text("\n")
-                        self.write_to_file(
-                            content_footer,
-                            os.path.join(config.data_path, f"footer.txt"),
-                        )
-                if main_content:
-                    text = main_content.get_text("\n")
-                else:
-                    body_content = soup.find("body")
-                    header = body_content.find("header")
-                    if header:
-                        header.extract()
-
-                    footer = body_content.find("footer")
-                    if footer:
-                        footer.extract()
-                    text = body_content.get_text("\n")
-
-                content = f"{text}"
-                sliced_content = content.split(" ")
-                if len(sliced_content) > 8000:
-                    sliced_content_one = " ".join(sliced_content[:8000])
-                    sliced_content_two = " ".join(sliced_content[8000:])
-                    self.write_to_file(
-                        sliced_content_one,
-                        os.path.join(config.data_path, f"data_{idx}_1.txt"),
-                    )
-                    self.write_to_file(
-                        sliced_content_two,
-                        os.path.join(config.data_path, f"data_{idx}_2.txt"),
-                    )
-                else:
-                    self.write_to_file(
-                        content.replace("\n\n", ""),
-                        os.path.join(config.data_path, f"data_{idx}.txt"),
-                    )
-
-                summarized_text = self.summarizer(
-                    text, "refine" if len(text) < 50000 else "map_reduce"
+        jobs = []
+        for url in urls:
+            if url not in self.store.seen:
+                self.fetch_url(url)
+            body_path = self.store.page_path(url)
+            if body_path:
+                jobs.append((url, body_path))
+
+        extractor = SiteExtractor()
+        summary_paths = deque()
+
+        def summary_jobs():
+            for url, title, text in extractor.run(jobs):
+                page = page_id(url)
+                text_path = os.path.join(config.data_path, f"data_{page}.txt")
+                summary_path = os.path.join(
+                    config.data_path, f"data_summarized_{page}.txt"
                 )
-                content_summarized = f"{summarized_text}"
-                self.write_to_file(
-                    content_summarized,
-                    os.path.join(config.data_path, f"data_summarized_{idx}.txt"),
-                )
-                logging.info(f"Processed and summarized content from URL: {url}")
+                content = metadata_header({"url": url, "title": title}) + text
+                if read_text(text_path) == content and os.path.exists(summary_path):
+                    logging.info(f"Skipping unchanged URL: {url}")
+                    continue
+                for file_path in self.page_files(page):
+                    os.remove(file_path)
+                self.write_text(content, text_path)
+                summary_paths.append(summary_path)
+                logging.info(f"Processed content from URL: {url}")
+                yield text, "refine" if len(text) < 50000 else "map_reduce"
+
+        for summarized_text in self.summarizer.summarize_all(summary_jobs()):
+            summary_path = summary_paths.popleft()
+            if summarized_text is not None:
+                self.write_to_file(f"{summarized_text}", summary_path)
+
+        for url in [*extractor.empty, *extractor.duplicates]:
+            for file_path in self.page_files(page_id(url)):
+                os.remove(file_path)
+        for url, original in extractor.duplicates.items():
+            logging.info(f"Skipped near-duplicate URL: {url} of {original}")
+        self.write_text(
+            "\n\n".join(extractor.boilerplate),
+            os.path.join(config.data_path, "boilerplate.txt"),
+        )
+        for file_name in ("header.txt", "footer.txt"):
+            file_path = os.path.join(config.data_path, file_name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        for url in self.store.prune():
+            for file_path in self.page_files(page_id(url)):
+                os.remove(file_path)
+            logging.info(f"Removed content of URL no longer found: {url}")
+        self.store.save()
 
         for pdf_url in self.pdf_urls:
             pdf_path = self.download_pdf(pdf_url)
             if pdf_path:
-                self.process_pdf(pdf_path, "")
+                self.process_pdf(pdf_path)
                 logging.info(f"Processed PDF content from URL: {pdf_url}")
 
-    def process_pdf(self, pdf_path, content):
+    def process_pdf(self, pdf_path):
+        """Streams a PDF into its raw text and summary files, page by page.
+
+        The raw text goes to pdf_raw_{name}.txt so it is chunked and embedded
+        like any other page; the summaries go to pdf_{name}.txt.
+        """
+        name = os.path.basename(pdf_path)
+        raw_path = os.path.join(config.data_path, f"pdf_raw_{name}.txt")
+        summary_path = os.path.join(config.data_path, f"pdf_{name}.txt")
         try:
-            reader = PdfReader(pdf_path)
-            for page in reader.pages:
-                content += f"{self.summarizer(page.extract_text(), 'map_reduce')}\n\n"
+            with open(raw_path, "w") as raw_file, open(
+                summary_path, "w"
+            ) as summary_file:
+
+                def jobs():
+                    for text in iter_pdf_pages(pdf_path):
+                        raw_file.write(f"{text}\n\n")
+                        yield text, "map_reduce"
+
+                for summary in self.summarizer.summarize_all(jobs()):
+                    if summary is not None:
+                        summary_file.write(f"{summary}\n\n".replace("..", ""))
             logging.info(f"Processed PDF file: {pdf_path}")
-            self.write_to_file(
-                content,
-                os.path.join(config.data_path, f"pdf_{os.path.basename(pdf_path)}.txt"),
-            )
         except Exception as e:
             logging.error(f"Error reading PDF {pdf_path}: {e}")
 
-    def write_to_file(self, content, file_path):
+    def write_text(self, content, file_path):
+        """Writes extracted text as is, unlike write_to_file."""
         try:
             with open(file_path, "w") as f:
-                f.write(content.replace("..", ""))
+                f.write(content)
             logging.info(f"Wrote content to file: {file_path}")
         except IOError as e:
             logging.error(f"Error writing content to file {file_path}: {e}")
 
+    def write_to_file(self, content, file_path):
+        self.write_text(content.replace("..", ""), file_path)
+
     def run(self):
         logging.info("Starting web scraping process...")
         self.crawl_urls()
+        self.store.save()
         self.sort_urls()
         self.create_txt()
+        if self.driver is not None:
+            self.driver.quit()
         logging.info("Data collection complete.")
 
 
+def read_text(file_path):
+    try:
+        with open(file_path, "r") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
 def create_database():
     database_path = os.path.join(config.database_path, "database.db")
 
     if not os.path.exists(database_path):
         con = sqlite3.connect(database_path)
-        cur = con.cursor()
-
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT NOT NULL,
-                message_content TEXT NOT NULL,
-                role TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """
-        )
-
-        con.commit()
+        create_schema(con)
         con.close()
         print("Database created successfully")
     else:
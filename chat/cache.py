@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class SemanticCache:
+    """Answers keyed on question embeddings and matched by cosine similarity.
+
+    Holds at most `maxsize` answers and evicts the oldest first.
+    """
+
+    def __init__(self, maxsize, threshold):
+        self.threshold = threshold
+        self.entries = deque(maxlen=maxsize)
+        self.matrix = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, vector):
+        with self.lock:
+            if self.entries and self.matrix is None:
+                self.matrix = np.array([entry[0] for entry in self.entries])
+            if self.matrix is not None:
+                scores = self.matrix @ unit_vector(vector)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    return self.entries[best][1]
+            self.misses += 1
+            return None
+
+    def add(self, vector, answer):
+        if self.entries.maxlen == 0:
+            return
+        with self.lock:
+            self.entries.append((unit_vector(vector), answer))
+            self.matrix = None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.matrix = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def unit_vector(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,94 @@
+import json
+import os
+
+import config
+from langchain.docstore.document import Document
+
+SEPARATORS = ("\n\n", "\n", " ")
+# First line of a text file carrying metadata for all of its chunks.
+METADATA_PREFIX = "#metadata "
+
+
+def metadata_header(metadata):
+    return METADATA_PREFIX + json.dumps(metadata) + "\n"
+
+
+def read_metadata(file):
+    """Reads the metadata header of an open file, leaving it at the text."""
+    line = file.readline()
+    if line.startswith(METADATA_PREFIX):
+        return json.loads(line[len(METADATA_PREFIX) :])
+    file.seek(0)
+    return {}
+
+
+def find_split(window, min_end):
+    """Returns the end of the chunk, preferring paragraph, line and word breaks."""
+    for separator in SEPARATORS:
+        position = window.rfind(separator, min_end)
+        if position != -1:
+            return position + len(separator)
+    return len(window)
+
+
+def iter_text_chunks(stream, chunk_size, chunk_overlap):
+    """Lazily yields (offset, text) overlapping chunks read from a text stream.
+
+    Only about one chunk of text is held in memory at a time. Offsets are
+    character positions in the stream.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+    buffer = ""
+    offset = 0
+    eof = False
+    while True:
+        while not eof and len(buffer) <= chunk_size:
+            block = stream.read(chunk_size)
+            if not block:
+                eof = True
+            buffer += block
+
+        if len(buffer) <= chunk_size:
+            if buffer.strip():
+                yield offset, buffer
+            return
+
+        end = find_split(buffer[:chunk_size], chunk_size // 2)
+        if buffer[:end].strip():
+            yield offset, buffer[:end]
+
+        start = max(end - chunk_overlap, 1)
+        # Start the overlap on a word boundary when there is one.
+        space = buffer.find(" ", start, end)
+        if chunk_overlap and space != -1:
+            start = space + 1
+        buffer = buffer[start:]
+        offset += start
+
+
+def iter_file_chunks(
+    file_path, chunk_size=config.chunk_size, chunk_overlap=config.chunk_overlap
+):
+    """Yields the chunks of a text file as Documents with source metadata,
+    plus the file's own metadata header, such as a page's url and title."""
+    source = os.path.basename(file_path)
+    with open(file_path, "r") as file:
+        metadata = read_metadata(file)
+        for offset, text in iter_text_chunks(file, chunk_size, chunk_overlap):
+            yield Document(
+                page_content=text,
+                metadata={**metadata, "source": source, "start_index": offset},
+            )
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
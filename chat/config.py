@@ -5,21 +5,102 @@ website_url = environ.get("WEBSITE_URL", "https://agetechcollaborative.org/")
 base_storage_path = environ.get("BASE_STORAGE_PATH", "storage")
 data_path = environ.get("DATA_PATH", f"{base_storage_path}/data")
 database_path = environ.get("DATABASE_PATH", f"{base_storage_path}/database")
+summary_cache_path = environ.get(
+    "SUMMARY_CACHE_PATH", f"{base_storage_path}/summaries"
+)
+page_store_path = environ.get("PAGE_STORE_PATH", f"{base_storage_path}/pages")
 vector_database_path = environ.get(
     "VECTOR_DATABASE_PATH", f"{base_storage_path}/vector-database/"
 )
+embedding_manifest_path = os.path.join(vector_database_path, "manifest.json")
+keyword_index_path = os.path.join(vector_database_path, "keyword_index.json")
+numpy_store_path = os.path.join(vector_database_path, "numpy")
+vector_store = environ.get("VECTOR_STORE", "chroma")
+vector_store_dtype = environ.get("VECTOR_STORE_DTYPE", "float32")
+vector_search_block = int(environ.get("VECTOR_SEARCH_BLOCK", "1024"))
+history_batch_size = int(environ.get("HISTORY_BATCH_SIZE", "500"))
 chunk_size = int(environ.get("CHUNK_SIZE", "1000"))
 chunk_overlap = int(environ.get("CHUNK_OVERLAP", "100"))
+ingest_batch_size = int(environ.get("INGEST_BATCH_SIZE", "256"))
 embedding_model_name = environ.get("EMBEDDING_MODEL_NAME", "nomic-embed-text")
+embedding_batch_size = int(environ.get("EMBEDDING_BATCH_SIZE", "32"))
+embedding_concurrency = int(environ.get("EMBEDDING_CONCURRENCY", "4"))
+embedding_max_retries = int(environ.get("EMBEDDING_MAX_RETRIES", "3"))
+embedding_retry_backoff = float(environ.get("EMBEDDING_RETRY_BACKOFF", "0.5"))
 model_name = environ.get("MODEL_NAME", "mistral")
 ollama_server = environ.get("OLLAMA_SERVER", "http://10.50.0.11:11434")
 model_temperature = float(environ.get("MODEL_TEMPERATURE", "0"))
+model_context_tokens = int(environ.get("MODEL_CONTEXT_TOKENS", "8192"))
+# Hugging Face tokenizer matching MODEL_NAME, e.g.
+# "mistralai/Mistral-7B-Instruct-v0.2"; token counts are estimated if unset.
+tokenizer_model = environ.get("TOKENIZER_MODEL", "")
+# "chat" sends a stable system message through /api/chat so Ollama can reuse
+# its cached prefix; "generate" sends the filled template as one prompt.
+generation_mode = environ.get("GENERATION_MODE", "generate")
+# How long Ollama keeps the model loaded after a request, e.g. "30m" or "-1m".
+model_keep_alive = environ.get("MODEL_KEEP_ALIVE", "30m")
+answer_token_reserve = int(environ.get("ANSWER_TOKEN_RESERVE", "1024"))
+system_token_budget = int(environ.get("SYSTEM_TOKEN_BUDGET", "1024"))
+question_token_budget = int(environ.get("QUESTION_TOKEN_BUDGET", "512"))
+history_token_budget = int(environ.get("HISTORY_TOKEN_BUDGET", "2048"))
 collection_name = environ.get("COLLECTION_NAME", "vector_db")
 number_of_retrieved_sources = int(environ.get("NUMBER_OF_RETRIEVED_SOURCES", "2"))
+retrieval_mode = environ.get("RETRIEVAL_MODE", "hybrid")
+retrieval_candidates = int(environ.get("RETRIEVAL_CANDIDATES", "20"))
+rrf_k = int(environ.get("RRF_K", "60"))
+generation_concurrency = int(environ.get("GENERATION_CONCURRENCY", "2"))
+generation_queue_timeout = float(environ.get("GENERATION_QUEUE_TIMEOUT", "60"))
+generation_timeout = float(environ.get("GENERATION_TIMEOUT", "120"))
+query_cache_size = int(environ.get("QUERY_CACHE_SIZE", "1024"))
+query_cache_ttl = int(environ.get("QUERY_CACHE_TTL", "3600"))
+memory_token_budget = int(environ.get("MEMORY_TOKEN_BUDGET", "1500"))
+memory_max_turns = int(environ.get("MEMORY_MAX_TURNS", "20"))
+memory_summary_questions = int(environ.get("MEMORY_SUMMARY_QUESTIONS", "5"))
+# Share of the memory limits kept after compacting, see ConversationMemory.
+memory_compact_ratio = float(environ.get("MEMORY_COMPACT_RATIO", "0.5"))
+voice_enabled = environ.get("VOICE_ENABLED", "true") == "true"
+voice_warmup = environ.get("VOICE_WARMUP", "false") == "true"
+whisper_model = environ.get("WHISPER_MODEL", "base")
+stt_workers = int(environ.get("STT_WORKERS", "1"))
+stt_max_pending = int(environ.get("STT_MAX_PENDING", "8"))
+tts_backend = environ.get("TTS_BACKEND", "gtts")
+streaming_tts = environ.get("STREAMING_TTS", "false") == "true"
+tts_concurrency = int(environ.get("TTS_CONCURRENCY", "2"))
+tts_min_sentence_chars = int(environ.get("TTS_MIN_SENTENCE_CHARS", "20"))
+rerank_enabled = environ.get("RERANK_ENABLED", "false") == "true"
+reranker_model = environ.get("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+rerank_candidates = int(environ.get("RERANK_CANDIDATES", "20"))
+rerank_batch_size = int(environ.get("RERANK_BATCH_SIZE", "16"))
+rerank_cache_size = int(environ.get("RERANK_CACHE_SIZE", "10000"))
+context_token_budget = int(environ.get("CONTEXT_TOKEN_BUDGET", "1000"))
+answer_cache_enabled = environ.get("ANSWER_CACHE_ENABLED", "false") == "true"
+answer_cache_size = int(environ.get("ANSWER_CACHE_SIZE", "512"))
+answer_cache_threshold = float(environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+answer_cache_max_history_tokens = int(
+    environ.get("ANSWER_CACHE_MAX_HISTORY_TOKENS", "0")
+)
 url_ignire_list = environ.get(
     "URL_IGNORE_LIST", "login, signin, sign-up, register, auth"
 )
 page_load_timeout = int(environ.get("PAGE_LOAD_TIMEOUT", "45"))
+# A rendered page is ready once loaded with no new requests for this long.
+render_idle_time = float(environ.get("RENDER_IDLE_TIME", "0.5"))
+request_timeout = int(environ.get("REQUEST_TIMEOUT", "30"))
+crawl_concurrency = int(environ.get("CRAWL_CONCURRENCY", "8"))
+crawl_per_host = int(environ.get("CRAWL_PER_HOST", "4"))
+crawl_delay = float(environ.get("CRAWL_DELAY", "0.25"))
+min_page_text = int(environ.get("MIN_PAGE_TEXT", "200"))
+extract_workers = int(environ.get("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+boilerplate_min_pages = int(environ.get("BOILERPLATE_MIN_PAGES", "3"))
+boilerplate_page_ratio = float(environ.get("BOILERPLATE_PAGE_RATIO", "0.3"))
+near_duplicate_threshold = float(environ.get("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+summary_workers = int(environ.get("SUMMARY_WORKERS", "4"))
+pdf_workers = int(environ.get("PDF_WORKERS", str(os.cpu_count() or 1)))
+pdf_pages_per_task = int(environ.get("PDF_PAGES_PER_TASK", "16"))
+download_chunk_size = int(environ.get("DOWNLOAD_CHUNK_SIZE", str(1 << 16)))
+metrics_max_conversations = int(environ.get("METRICS_MAX_CONVERSATIONS", "200"))
+# /metrics is only served when set, to requests bearing this token.
+metrics_token = environ.get("METRICS_TOKEN", "")
 extra_urls = environ.get("EXTRA_URLS", "")
 base_prompt_file = base_storage_path + "/base_prompt.txt"
 if os.path.exists(base_prompt_file):
@@ -1,53 +1,213 @@
+import argparse
+import hashlib
+import json
 import logging
 import os
 
 import config
-from langchain.docstore.document import Document
-from langchain_community.embeddings import OllamaEmbeddings
+from chunker import batched, iter_file_chunks
+from embeddings import OllamaBatchEmbeddings
+from keyword_index import KeywordIndex
 from langchain_community.vectorstores import Chroma
 from logs import configure_logging
+from numpy_store import NumpyVectorStore
 from chromadb.config import Settings
 
+_manifest_mtime = None
+_manifest_version = 0
 
-def load_documents_from_folder(folder_path):
+
+def empty_manifest(version=0):
+    return {"version": version, "files": {}}
+
+
+def load_manifest():
+    """Loads the content-hash manifest of the files already embedded."""
+    if not os.path.exists(config.embedding_manifest_path):
+        return empty_manifest()
+    try:
+        with open(config.embedding_manifest_path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        logging.error(f"Error reading manifest, starting from scratch: {e}")
+        return empty_manifest()
+
+
+def collection_version():
+    """Version of the embedded collection, re-read only when the manifest changes."""
+    global _manifest_mtime, _manifest_version
+    try:
+        mtime = os.stat(config.embedding_manifest_path).st_mtime_ns
+    except OSError:
+        return 0
+    if mtime != _manifest_mtime:
+        _manifest_version = load_manifest()["version"]
+        _manifest_mtime = mtime
+    return _manifest_version
+
+
+def save_manifest(manifest):
+    tmp_path = config.embedding_manifest_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, config.embedding_manifest_path)
+
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_id(file_name, index):
+    """Stable vector id for the index-th document of a source file."""
+    return hashlib.sha1(f"{file_name}:{index}".encode()).hexdigest()
+
+
+def open_vectorstore(embedding):
+    """Opens the vector store selected by VECTOR_STORE: chroma or numpy."""
+    if config.vector_store == "numpy":
+        return NumpyVectorStore(embedding)
+    client_settings = Settings(anonymized_telemetry=False, is_persistent=True)
+    return Chroma(
+        persist_directory=config.vector_database_path,
+        embedding_function=embedding,
+        collection_name=config.collection_name,
+        client_settings=client_settings,
+    )
+
+
+def untracked_collection(vectorstore):
+    """True if the store holds vectors but there is no manifest for them.
+
+    Collections built before the manifest existed hold whole-file vectors
+    under random ids, which incremental embedding would never remove.
+    """
+    if os.path.exists(config.embedding_manifest_path):
+        return False
+    return bool(vectorstore.get(limit=1, include=[])["ids"])
+
+
+def sync_keyword_index(vectorstore, manifest, keyword_index):
+    """Rebuilds the keyword index from the vector store if they disagree.
+
+    That happens on first use, or if a run stopped before saving the index.
+    Returns True when the index was rebuilt.
+    """
+    expected = {
+        doc_id for entry in manifest["files"].values() for doc_id in entry["ids"]
+    }
+    if keyword_index.ids() == expected:
+        return False
+    logging.info("Rebuilding keyword index from the vector store.")
+    keyword_index.clear()
+    stored = vectorstore.get(include=["documents"])
+    for doc_id, text in zip(stored["ids"], stored["documents"]):
+        keyword_index.add(doc_id, text)
+    keyword_index.save()
+    return True
+
+
+def embed_folder(vectorstore, keyword_index, manifest, folder_path):
+    """Embeds new or changed files and drops the vectors of removed ones.
+
+    The keyword index is updated in step with the vector store; the caller
+    saves it. Returns True when the collection changed.
+    """
     logging.info(f"Loading documents from folder: {folder_path}")
-    files = os.listdir(folder_path)
-    documents = []
-    for file_name in files:
+    file_names = sorted(os.listdir(folder_path))
+    embedded = manifest["files"]
+    changed = False
+
+    for file_name in file_names:
         file_path = os.path.join(folder_path, file_name)
         try:
-            with open(file_path, "r") as file:
-                document_content = file.read()
-            documents.append(Document(page_content=document_content))
-            logging.info(f"Loaded document: {file_name}")
+            content_hash = file_hash(file_path)
+            entry = embedded.get(file_name)
+            if entry and entry["hash"] == content_hash:
+                continue
+
+            ids = []
+            chunks = iter_file_chunks(file_path)
+            for batch in batched(chunks, config.ingest_batch_size):
+                batch_ids = [
+                    document_id(file_name, len(ids) + idx) for idx in range(len(batch))
+                ]
+                for document, doc_id in zip(batch, batch_ids):
+                    document.metadata["id"] = doc_id
+                    keyword_index.add(doc_id, document.page_content)
+                vectorstore.add_documents(batch, ids=batch_ids)
+                ids.extend(batch_ids)
+            if entry:
+                stale_ids = set(entry["ids"]) - set(ids)
+                if stale_ids:
+                    vectorstore.delete(ids=list(stale_ids))
+                    for doc_id in stale_ids:
+                        keyword_index.remove(doc_id)
+
+            embedded[file_name] = {"hash": content_hash, "ids": ids}
+            save_manifest(manifest)
+            changed = True
+            logging.info(f"Embedded document: {file_name} ({len(ids)} chunks)")
         except Exception as e:
-            logging.error(f"Error loading document {file_name}: {e}")
+            logging.error(f"Error embedding document {file_name}: {e}")
+
+    for file_name in set(embedded) - set(file_names):
+        ids = embedded.pop(file_name)["ids"]
+        vectorstore.delete(ids=ids)
+        for doc_id in ids:
+            keyword_index.remove(doc_id)
+        save_manifest(manifest)
+        changed = True
+        logging.info(f"Removed document: {file_name}")
 
-    return documents
+    return changed
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Embed the scraped documents.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Drop the collection and re-embed every document.",
+    )
+    args = parser.parse_args()
+
     configure_logging()
     try:
-        logging.info("Starting document loading process.")
-        documents = load_documents_from_folder(config.data_path)
-        logging.info(f"Loaded {len(documents)} documents.")
+        logging.info("Starting document embedding process.")
+        embedding = OllamaBatchEmbeddings()
+        logging.info("Embedding model loaded successfully.")
 
-        logging.info("Creating vector database.")
+        vectorstore = open_vectorstore(embedding)
+        manifest = load_manifest()
+        keyword_index = KeywordIndex.load()
+        full = args.full
+        if not full and untracked_collection(vectorstore):
+            logging.info("Vector database has no manifest, rebuilding it.")
+            full = True
+        if full:
+            logging.info("Rebuilding vector database from scratch.")
+            vectorstore.delete_collection()
+            vectorstore = open_vectorstore(embedding)
+            manifest = empty_manifest(manifest["version"])
+            keyword_index.clear()
+            rebuilt = True
+        else:
+            rebuilt = sync_keyword_index(vectorstore, manifest, keyword_index)
 
-        embedding = OllamaEmbeddings(
-            base_url=config.ollama_server, model=config.embedding_model_name
-        )
-        logging.info("Embedding model loaded successfully.")
-        client_settings= Settings( anonymized_telemetry=False, is_persistent=True )
-        Chroma.from_documents(
-            documents=documents,
-            embedding=embedding,
-            persist_directory=config.vector_database_path,
-            collection_name=config.collection_name,
-            client_settings=client_settings
-        )
-        logging.info("Vector database created successfully.")
+        changed = embed_folder(vectorstore, keyword_index, manifest, config.data_path)
+        if changed or rebuilt:
+            keyword_index.save()
+            manifest["version"] += 1
+            save_manifest(manifest)
+            logging.info(
+                f"Vector database updated to version {manifest['version']}."
+            )
+        else:
+            logging.info("Vector database is up to date.")
     except Exception as e:
         logging.error(f"Error creating vector database: {e}")
 
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import requests
+from langchain_core.embeddings import Embeddings
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OllamaBatchEmbeddings(Embeddings):
+    """Embeds texts against Ollama in batches with bounded parallelism.
+
+    Batches go to /api/embed over one pooled HTTP session, with at most
+    `concurrency` requests in flight. Servers without /api/embed fall back
+    to one /api/embeddings request per text. Vectors are L2-normalized on
+    both paths so the two endpoints produce interchangeable results.
+    """
+
+    def __init__(
+        self,
+        base_url=config.ollama_server,
+        model=config.embedding_model_name,
+        batch_size=config.embedding_batch_size,
+        concurrency=config.embedding_concurrency,
+        max_retries=config.embedding_max_retries,
+        retry_backoff=config.embedding_retry_backoff,
+        timeout=60,
+        embed_instruction="passage: ",
+        query_instruction="query: ",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.embed_instruction = embed_instruction
+        self.query_instruction = query_instruction
+        self.batch_endpoint = True
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="embed"
+        )
+
+    def post(self, path, payload):
+        """POSTs to Ollama, retrying connection errors and 429/5xx with backoff.
+
+        Returns None when the endpoint does not exist.
+        """
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                if response.status_code == 404:
+                    return None
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.max_retries:
+                raise requests.RequestException(
+                    f"Embedding request to {url} failed after "
+                    f"{attempt + 1} attempts: {error}"
+                )
+            delay = self.retry_backoff * 2**attempt
+            logging.warning(f"Embedding request failed ({error}), retrying in {delay}s")
+            time.sleep(delay)
+
+    def embed_batch(self, texts):
+        if self.batch_endpoint:
+            response = self.post("/api/embed", {"model": self.model, "input": texts})
+            if response is not None:
+                return [normalize(vector) for vector in response["embeddings"]]
+            logging.info("Ollama has no /api/embed, falling back to /api/embeddings")
+            self.batch_endpoint = False
+
+        vectors = []
+        for text in texts:
+            response = self.post(
+                "/api/embeddings", {"model": self.model, "prompt": text}
+            )
+            if response is None:
+                raise requests.RequestException(
+                    f"Embedding model {self.model} not found on {self.base_url}"
+                )
+            vectors.append(normalize(response["embedding"]))
+        return vectors
+
+    def embed_documents(self, texts):
+        texts = [f"{self.embed_instruction}{text}" for text in texts]
+        batches = [
+            texts[idx : idx + self.batch_size]
+            for idx in range(0, len(texts), self.batch_size)
+        ]
+        return [
+            vector
+            for vectors in self.executor.map(self.embed_batch, batches)
+            for vector in vectors
+        ]
+
+    def embed_query(self, text):
+        return self.embed_batch([f"{self.query_instruction}{text}"])[0]
+
+    async def aembed_documents(self, texts):
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.embed_query, text)
+
+
+def normalize(vector):
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
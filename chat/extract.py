@@ -0,0 +1,189 @@
+import hashlib
+import unicodedata
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from bs4 import BeautifulSoup
+from bs4.element import NavigableString, PreformattedString
+
+import config
+from pipeline import bounded_map
+
+# Elements whose own text forms one block; inline text belongs to the
+# nearest of these above it.
+BLOCK_TAGS = frozenset(
+    (
+        "address article aside blockquote body caption dd details div dl dt "
+        "figcaption figure footer form h1 h2 h3 h4 h5 h6 header li main nav ol "
+        "p pre section summary table td th tr ul"
+    ).split()
+)
+SKIP_TAGS = frozenset({"head", "noscript", "script", "style", "svg", "template"})
+
+SHINGLE_WORDS = 5
+PERMUTATIONS = 64
+BANDS = 16
+# Largest prime below 2**32, so a * x + b fits in 64 bits for 32-bit x.
+PRIME = 4294967291
+_rng = np.random.default_rng(0)
+_A = _rng.integers(1, PRIME, PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize(text):
+    """NFKC-normalizes text and collapses runs of whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def block_hash(text):
+    return hashlib.blake2b(text.lower().encode(), digest_size=8).hexdigest()
+
+
+def block_of(string, root):
+    """The nearest block element above a text node."""
+    for parent in string.parents:
+        if parent.name in BLOCK_TAGS or parent is root:
+            return parent
+    return root
+
+
+def iter_blocks(soup):
+    """Yields (hash, text) for each block of text in document order."""
+    root = soup.body or soup
+    current = None
+    parts = []
+    for string in root.descendants:
+        if not isinstance(string, NavigableString):
+            continue
+        if isinstance(string, PreformattedString):
+            continue
+        if string.parent.name in SKIP_TAGS:
+            continue
+        block = block_of(string, root)
+        if block is not current and parts:
+            text = normalize("".join(parts))
+            if text:
+                yield block_hash(text), text
+            parts = []
+        current = block
+        parts.append(string)
+    text = normalize("".join(parts))
+    if text:
+        yield block_hash(text), text
+
+
+def extract_page(job):
+    """Parses a stored page into its title and text blocks; runs in a worker."""
+    url, body_path = job
+    with open(body_path, "r") as file:
+        soup = BeautifulSoup(file.read(), "lxml")
+    heading = soup.title or soup.find("h1")
+    title = normalize(heading.get_text(" ")) if heading else ""
+    return url, title, list(iter_blocks(soup))
+
+
+def minhash(text):
+    """MinHash signature of the text's word shingles, or None if it is empty."""
+    words = text.lower().split()
+    if not words:
+        return None
+    shingles = {
+        zlib.crc32(" ".join(words[start : start + SHINGLE_WORDS]).encode())
+        for start in range(max(len(words) - SHINGLE_WORDS + 1, 1))
+    }
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    return ((_A[:, None] * values + _B[:, None]) % PRIME).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """Finds pages whose MinHash signatures agree on at least `threshold` of
+    their values, using banded locality-sensitive hashing for candidates."""
+
+    def __init__(self, threshold=config.near_duplicate_threshold, bands=BANDS):
+        self.threshold = threshold
+        self.rows = PERMUTATIONS // bands
+        self.buckets = {}
+
+    def add(self, key, signature):
+        """Returns the key of an earlier near-duplicate, or adds this one."""
+        bands = [
+            (start, signature[start : start + self.rows].tobytes())
+            for start in range(0, PERMUTATIONS, self.rows)
+        ]
+        for band in bands:
+            for other_key, other in self.buckets.get(band, ()):
+                if np.mean(signature == other) >= self.threshold:
+                    return other_key
+        for band in bands:
+            self.buckets.setdefault(band, []).append((key, signature))
+        return None
+
+
+class SiteExtractor:
+    """Turns stored HTML pages into clean text for the chunker.
+
+    Pages are parsed across a process pool. Text blocks found on at least
+    `min_pages` pages and `page_ratio` of all pages (navigation, headers,
+    footers, cookie banners) are boilerplate: they are dropped from every
+    page and kept once in `boilerplate`. Pages are then visited shortest URL
+    first, and a page whose MinHash signature is a near-duplicate of one
+    already kept is recorded in `duplicates` instead of being yielded.
+
+    Block hashes and texts of every page are held until the boilerplate is
+    known, which is about the size of the site's text.
+    """
+
+    def __init__(
+        self,
+        workers=config.extract_workers,
+        min_pages=config.boilerplate_min_pages,
+        page_ratio=config.boilerplate_page_ratio,
+        duplicate_threshold=config.near_duplicate_threshold,
+    ):
+        self.workers = workers
+        self.min_pages = min_pages
+        self.page_ratio = page_ratio
+        self.duplicate_threshold = duplicate_threshold
+        self.boilerplate = []
+        self.duplicates = {}
+        self.empty = []
+
+    def parse(self, jobs):
+        if self.workers <= 1:
+            return [extract_page(job) for job in jobs]
+        with ProcessPoolExecutor(self.workers) as executor:
+            return list(bounded_map(executor, extract_page, jobs, self.workers * 2))
+
+    def run(self, jobs):
+        """Yields (url, title, text) for each distinct page of (url, body_path)
+        jobs. `boilerplate`, `duplicates` and `empty` are set as it goes."""
+        pages = self.parse(jobs)
+        counts = Counter(
+            block for _, _, blocks in pages for block in {h for h, _ in blocks}
+        )
+        cutoff = max(self.min_pages, self.page_ratio * len(pages))
+        repeated = {block for block, count in counts.items() if count >= cutoff}
+        first_seen = {}
+        for _, _, blocks in pages:
+            for block, text in blocks:
+                if block in repeated:
+                    first_seen.setdefault(block, text)
+        self.boilerplate = list(first_seen.values())
+
+        index = NearDuplicateIndex(self.duplicate_threshold)
+        pages.sort(key=lambda page: (len(page[0]), page[0]))
+        for url, title, blocks in pages:
+            text = "\n\n".join(
+                body for block, body in blocks if block not in repeated
+            )
+            signature = minhash(text)
+            if signature is None:
+                self.empty.append(url)
+                continue
+            original = index.add(url, signature)
+            if original is not None:
+                self.duplicates[url] = original
+                continue
+            yield url, title, text
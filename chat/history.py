@@ -0,0 +1,113 @@
+import asyncio
+import atexit
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+
+INSERT_MESSAGE = (
+    "INSERT INTO chat_history (conversation_id, message_content, role) "
+    "VALUES (?, ?, ?);"
+)
+
+
+def create_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL,
+            message_content TEXT NOT NULL,
+            role TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_conversation_id "
+        "ON chat_history (conversation_id);"
+    )
+    con.commit()
+
+
+class ChatHistoryStore:
+    """Writes chat messages through one SQLite connection in WAL mode.
+
+    save() only enqueues the message. A background task drains the queue
+    and writes up to `batch_size` messages per transaction on a dedicated
+    thread, so the event loop never waits on SQLite. Messages queued while
+    a write is in progress go out together in the next transaction.
+    """
+
+    def __init__(self, database_file, batch_size=config.history_batch_size):
+        self.database_file = database_file
+        self.batch_size = batch_size
+        self.con = None
+        self.pending = []
+        self.queue = None
+        self.writer = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chat-history"
+        )
+        atexit.register(self.close)
+
+    def connect(self):
+        if self.con is None:
+            self.con = sqlite3.connect(self.database_file, check_same_thread=False)
+            self.con.execute("PRAGMA journal_mode=WAL;")
+            self.con.execute("PRAGMA synchronous=NORMAL;")
+            create_schema(self.con)
+        return self.con
+
+    def write(self, rows):
+        try:
+            con = self.connect()
+            # Batches mix conversations, so writes are not tagged with one.
+            with metrics.sqlite_write_seconds.time(conversation=""), con:
+                con.executemany(INSERT_MESSAGE, rows)
+        except sqlite3.Error as e:
+            logging.error(f"An error occurred writing {len(rows)} messages: {e}")
+
+    def write_pending(self):
+        rows, self.pending = self.pending, []
+        self.write(rows)
+
+    async def save(self, conversation_id, message_content, role):
+        if self.writer is None:
+            self.queue = asyncio.Queue()
+            self.writer = asyncio.create_task(self.run())
+        self.queue.put_nowait((conversation_id, message_content, role))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            rows = [await self.queue.get()]
+            while len(rows) < self.batch_size and not self.queue.empty():
+                rows.append(self.queue.get_nowait())
+            self.pending = rows
+            await loop.run_in_executor(self.executor, self.write_pending)
+            for _ in rows:
+                self.queue.task_done()
+
+    async def flush(self):
+        """Waits until every queued message is written."""
+        if self.queue is not None:
+            await self.queue.join()
+
+    def close(self):
+        """Writes whatever is still queued and closes the connection.
+
+        Runs at interpreter exit, once the event loop is gone. In-flight writes
+        finish first, then the rest is written from the calling thread.
+        """
+        self.executor.shutdown(wait=True)
+        rows = self.pending
+        while self.queue is not None and not self.queue.empty():
+            rows.append(self.queue.get_nowait())
+        if rows:
+            self.write(rows)
+        if self.con is not None:
+            self.con.close()
+            self.con = None
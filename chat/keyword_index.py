@@ -0,0 +1,107 @@
+import heapq
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+import config
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordIndex:
+    """In-memory BM25 inverted index over the embedded chunks.
+
+    Catches exact-term queries (program names, addresses, acronyms) that
+    vector search misses. Only the per-document term counts are persisted,
+    as JSON next to the vector store; postings are rebuilt on load.
+    """
+
+    def __init__(self, path=config.keyword_index_path, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.documents = {}
+        self.postings = {}
+        self.total_length = 0
+
+    @classmethod
+    def load(cls, path=config.keyword_index_path):
+        index = cls(path)
+        try:
+            with open(path, "r") as file:
+                documents = json.load(file)["documents"]
+        except FileNotFoundError:
+            return index
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Error reading keyword index, starting empty: {e}")
+            return index
+        for doc_id, (length, terms) in documents.items():
+            index.insert(doc_id, length, terms)
+        return index
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"documents": self.documents}, file)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def ids(self):
+        return set(self.documents)
+
+    def insert(self, doc_id, length, terms):
+        self.documents[doc_id] = (length, terms)
+        self.total_length += length
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        tokens = tokenize(text)
+        self.insert(doc_id, len(tokens), dict(Counter(tokens)))
+
+    def remove(self, doc_id):
+        entry = self.documents.pop(doc_id, None)
+        if entry is None:
+            return
+        length, terms = entry
+        self.total_length -= length
+        for term in terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+
+    def clear(self):
+        self.documents.clear()
+        self.postings.clear()
+        self.total_length = 0
+
+    def search(self, query, k):
+        """Returns the ids of the k best BM25 matches, best first."""
+        if not self.documents:
+            return []
+        count = len(self.documents)
+        average_length = self.total_length / count or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, frequency in posting.items():
+                length = self.documents[doc_id][0]
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (
+                    self.k1 + 1
+                ) / (frequency + norm)
+        return heapq.nlargest(k, scores, key=scores.get)
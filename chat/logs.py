@@ -1,8 +1,22 @@
+import atexit
 import logging
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+_listener = None
 
 
 def configure_logging(to_file=False, file_name="app.log"):
+    """Sets up the root logger once; later calls are no-ops.
+
+    Records go through a queue to a listener thread, so logging never
+    blocks the caller on console or file I/O.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
     # Create a logger
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
@@ -11,10 +25,6 @@ def configure_logging(to_file=False, file_name="app.log"):
     stdout_handler = logging.StreamHandler(stream=sys.stdout)
     stdout_handler.setLevel(logging.INFO)
 
-    # Create a file handler
-    file_handler = logging.FileHandler(file_name)
-    file_handler.setLevel(logging.DEBUG)
-
     # Create formatters
     console_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
     file_formatter = logging.Formatter(
@@ -23,10 +33,18 @@ def configure_logging(to_file=False, file_name="app.log"):
 
     # Set formatters for handlers
     stdout_handler.setFormatter(console_formatter)
-    file_handler.setFormatter(file_formatter)
-
-    # Add handlers to the logger
-    logger.addHandler(stdout_handler)
+    handlers = [stdout_handler]
 
     if to_file:
-        logger.addHandler(file_handler)
+        # Create a file handler
+        file_handler = logging.FileHandler(file_name)
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
+
+    # Hand records to the handlers on a background thread
+    queue = SimpleQueue()
+    logger.addHandler(QueueHandler(queue))
+    _listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
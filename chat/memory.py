@@ -0,0 +1,66 @@
+from collections import deque
+
+import config
+from tokens import count_tokens
+
+SUMMARY_PREFIX = "Earlier the user asked about: "
+SUMMARY_QUESTION_CHARS = 80
+
+
+class ConversationMemory:
+    """Recent chat turns kept within a token budget.
+
+    Turns live in a deque with their token counts, so adding a turn never
+    re-scans the history. Once the turns exceed `token_budget` or
+    `max_turns`, the oldest are dropped until both are within
+    `compact_ratio` of their limit, and only a short rolling summary of
+    their questions is kept. The latest turn is always kept verbatim.
+
+    Between compactions the rendered history only grows, so a prompt that
+    starts with it keeps the same prefix; compacting in large steps rather
+    than one turn at a time keeps those stretches long.
+    """
+
+    def __init__(
+        self,
+        token_budget=config.memory_token_budget,
+        max_turns=config.memory_max_turns,
+        summary_questions=config.memory_summary_questions,
+        compact_ratio=config.memory_compact_ratio,
+    ):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.compact_ratio = compact_ratio
+        self.turns = deque()
+        self.tokens = 0
+        self.earlier_questions = deque(maxlen=summary_questions)
+        self.compactions = 0
+
+    def add(self, human, ai):
+        turn = f"Human: {human}\nAI: {ai}\n"
+        self.turns.append((human, turn, count_tokens(turn)))
+        self.tokens += self.turns[-1][2]
+        if len(self.turns) > self.max_turns or self.tokens > self.token_budget:
+            self.compact()
+
+    def compact(self):
+        max_tokens = self.token_budget * self.compact_ratio
+        max_turns = self.max_turns * self.compact_ratio
+        while len(self.turns) > 1 and (
+            self.tokens > max_tokens or len(self.turns) > max_turns
+        ):
+            self.drop_oldest()
+        self.compactions += 1
+
+    def drop_oldest(self):
+        human, _, tokens = self.turns.popleft()
+        self.tokens -= tokens
+        if self.earlier_questions.maxlen:
+            self.earlier_questions.append(human[:SUMMARY_QUESTION_CHARS])
+
+    def render(self):
+        parts = []
+        if self.earlier_questions:
+            parts.append(SUMMARY_PREFIX + "; ".join(self.earlier_questions) + "\n")
+        parts.extend(turn for _, turn, _ in self.turns)
+        return "".join(parts)
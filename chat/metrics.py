@@ -0,0 +1,156 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import config
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+TOKEN_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192)
+OTHER = "_other"
+
+# Set by the chat handlers; copied into executor threads with the context.
+conversation_id = ContextVar("conversation_id", default="")
+
+_registry = []
+
+
+class Histogram:
+    """Cumulative histogram with one series per conversation id.
+
+    At most `max_series` conversations are kept; the least recently seen
+    are folded into a single "_other" series so totals stay monotonic.
+    """
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        buckets=LATENCY_BUCKETS,
+        max_series=config.metrics_max_conversations,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.max_series = max_series
+        self.lock = threading.Lock()
+        self.series = OrderedDict()
+        _registry.append(self)
+
+    def new_series(self):
+        # One count per bucket, then +Inf, then the sum.
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value, conversation=None):
+        label = conversation_id.get() if conversation is None else conversation
+        with self.lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = self.new_series()
+                if len(self.series) > self.max_series:
+                    self.fold_oldest()
+            else:
+                self.series.move_to_end(label)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def fold_oldest(self):
+        label = next(label for label in self.series if label != OTHER)
+        evicted = self.series.pop(label)
+        other = self.series.setdefault(OTHER, self.new_series())
+        for index, value in enumerate(evicted):
+            other[index] += value
+
+    @contextmanager
+    def time(self, conversation=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, conversation)
+
+    def timed(self, function):
+        """Decorator observing the duration of every call."""
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.time():
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = [(label, list(values)) for label, values in self.series.items()]
+        for label, values in series:
+            tag = f'conversation_id="{label}"'
+            count = 0
+            for bound, bucket in zip((*self.buckets, "+Inf"), values):
+                count += bucket
+                lines.append(f'{self.name}_bucket{{{tag},le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{tag}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{tag}}} {count}")
+        return lines
+
+
+class Gauge:
+    """A single process-wide value that goes up and down."""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        _registry.append(self)
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.value}",
+        ]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+time_to_first_token = Histogram(
+    "chat_time_to_first_token_seconds", "Time from question to first answer token."
+)
+tokens_per_second = Histogram(
+    "chat_tokens_per_second", "Answer tokens streamed per second.", RATE_BUCKETS
+)
+retrieval_seconds = Histogram(
+    "chat_retrieval_seconds", "Time to retrieve the context documents."
+)
+prompt_tokens = Histogram(
+    "chat_prompt_tokens", "Tokens in the assembled prompt.", TOKEN_BUCKETS
+)
+context_tokens = Histogram(
+    "chat_context_tokens", "Document tokens in the assembled prompt.", TOKEN_BUCKETS
+)
+embedding_seconds = Histogram("chat_embedding_seconds", "Time to embed a question.")
+stt_seconds = Histogram("chat_stt_seconds", "Time to transcribe a voice message.")
+tts_seconds = Histogram("chat_tts_seconds", "Time to synthesize speech.")
+sqlite_write_seconds = Histogram(
+    "chat_sqlite_write_seconds", "Time to write one batch of chat history."
+)
+generation_queue_wait_seconds = Histogram(
+    "chat_generation_queue_wait_seconds", "Time waiting for a generation slot."
+)
+generation_queue_depth = Gauge(
+    "chat_generation_queue_depth", "Generations waiting for a slot."
+)
+generation_running = Gauge("chat_generation_running", "Generations in progress.")
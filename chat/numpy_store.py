@@ -0,0 +1,355 @@
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+import config
+
+DTYPES = ("float32", "float16", "int8")
+# Unit vectors are stored as int8 scaled by this, so |component| <= 127.
+INT8_SCALE = 127.0
+
+
+class Rows:
+    """One consistent view of the rows; replaced whole, never changed in place."""
+
+    def __init__(self, ids, texts, metadatas, live, positions, vectors):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.live = live
+        self.positions = positions
+        self.vectors = vectors
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact-search vector store kept in a memory-mapped NumPy file.
+
+    Vectors are appended to vectors.{generation}.bin, one row per chunk,
+    and read through np.memmap, so worker processes share the same pages
+    through the OS page cache. rows.{generation}.jsonl is the sidecar: one
+    line per row with its id, text and metadata, and one line per deletion.
+    meta.json holds the dimension, dtype and current generation; compaction
+    writes a new generation and switches meta.json atomically.
+
+    The rows are held in a Rows snapshot that is rebuilt and swapped under
+    `lock`, so threads searching while another reloads or writes each see
+    one consistent version.
+
+    A row's vector is written before its sidecar line, so a writer killed
+    mid-append leaves either vector rows with no sidecar line or a torn last
+    line. Readers ignore both; writers cut them off with `repair()` before
+    appending, which keeps row n of the sidecar on row n of the vectors.
+
+    float16 and int8 rows quantize the vectors; int8 expects unit vectors,
+    which OllamaBatchEmbeddings returns. Search is one matrix product over
+    all rows, done in blocks so quantized rows are widened a block at a
+    time.
+    """
+
+    def __init__(
+        self,
+        embedding,
+        path=config.numpy_store_path,
+        dtype=config.vector_store_dtype,
+        block_rows=config.vector_search_block,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}, use one of {DTYPES}")
+        self.embedding = embedding
+        self.path = path
+        self.meta_path = os.path.join(path, "meta.json")
+        self.block_rows = block_rows
+        os.makedirs(path, exist_ok=True)
+        self.lock = threading.RLock()
+        self.meta = {"dim": None, "dtype": dtype, "generation": 0}
+        self.load()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def vectors_path(self, generation=None):
+        generation = self.meta["generation"] if generation is None else generation
+        return os.path.join(self.path, f"vectors.{generation}.bin")
+
+    def rows_path(self, generation=None):
+        generation = self.meta["generation"] if generation is None else generation
+        return os.path.join(self.path, f"rows.{generation}.jsonl")
+
+    def stamp(self):
+        try:
+            meta = os.stat(self.meta_path)
+            rows = os.stat(self.rows_path())
+        except OSError:
+            return None
+        return meta.st_mtime_ns, rows.st_size
+
+    def load(self):
+        with self.lock:
+            # Stamped first, so a write during the read triggers a reload.
+            stamp = self.stamp()
+            try:
+                with open(self.meta_path, "r") as file:
+                    self.meta = json.load(file)
+            except FileNotFoundError:
+                pass
+            ids = []
+            texts = []
+            metadatas = []
+            live = []
+            positions = {}
+            try:
+                with open(self.rows_path(), "r") as file:
+                    for line in file:
+                        # A writer may be mid-line; the rest shows up next load.
+                        if not line.endswith("\n"):
+                            break
+                        record = json.loads(line)
+                        if "delete" in record:
+                            for doc_id in record["delete"]:
+                                row = positions.pop(doc_id, None)
+                                if row is not None:
+                                    live[row] = False
+                            continue
+                        positions[record["id"]] = len(ids)
+                        ids.append(record["id"])
+                        texts.append(record["text"])
+                        metadatas.append(record["metadata"])
+                        live.append(True)
+            except FileNotFoundError:
+                pass
+            self.rows = Rows(
+                ids,
+                texts,
+                metadatas,
+                np.array(live, dtype=bool),
+                positions,
+                self.map_vectors(len(ids)),
+            )
+            self.loaded_stamp = stamp
+
+    def map_vectors(self, rows):
+        dtype = np.dtype(self.meta["dtype"])
+        if self.meta["dim"] and os.path.exists(self.vectors_path()):
+            row_bytes = self.meta["dim"] * dtype.itemsize
+            rows = min(rows, os.path.getsize(self.vectors_path()) // row_bytes)
+        if not rows:
+            return np.empty((0, self.meta["dim"] or 0), dtype=dtype)
+        return np.memmap(
+            self.vectors_path(), dtype=dtype, mode="r", shape=(rows, self.meta["dim"])
+        )
+
+    def refresh(self):
+        """Reloads if another process has written to the store, and returns
+        the current rows."""
+        with self.lock:
+            if self.stamp() != self.loaded_stamp:
+                self.load()
+            return self.rows
+
+    def save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.meta, file)
+        os.replace(tmp_path, self.meta_path)
+
+    def quantize(self, vectors):
+        if self.meta["dtype"] == "int8":
+            scaled = np.rint(vectors * INT8_SCALE)
+            return np.clip(scaled, -INT8_SCALE, INT8_SCALE).astype(np.int8)
+        return vectors.astype(self.meta["dtype"])
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Embeds and appends texts; existing ids are replaced."""
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+        with self.lock:
+            if self.meta["dim"] is None:
+                self.meta["dim"] = vectors.shape[1]
+                self.save_meta()
+            rows = self.repair()
+            self.delete([doc_id for doc_id in ids if doc_id in rows.positions])
+            rows = self.rows
+
+            with open(self.vectors_path(), "ab") as file:
+                file.write(self.quantize(vectors).tobytes())
+            records = [
+                {"id": doc_id, "text": text, "metadata": metadata or {}}
+                for doc_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            self.append_records(records)
+            positions = dict(rows.positions)
+            for row, doc_id in enumerate(ids, start=len(rows.ids)):
+                positions[doc_id] = row
+            self.rows = Rows(
+                rows.ids + ids,
+                rows.texts + texts,
+                rows.metadatas + [record["metadata"] for record in records],
+                np.concatenate([rows.live, np.ones(len(records), dtype=bool)]),
+                positions,
+                self.map_vectors(len(rows.ids) + len(ids)),
+            )
+            self.loaded_stamp = self.stamp()
+        return ids
+
+    def repair(self):
+        """Truncates what an interrupted append left behind and returns the
+        current rows. Only for writers: a reader would cut off a write in
+        progress."""
+        with self.lock:
+            self.truncate_torn_line()
+            rows = self.refresh()
+            if self.meta["dim"] and os.path.exists(self.vectors_path()):
+                row_bytes = self.meta["dim"] * np.dtype(self.meta["dtype"]).itemsize
+                size = len(rows.ids) * row_bytes
+                if os.path.getsize(self.vectors_path()) > size:
+                    os.truncate(self.vectors_path(), size)
+            return rows
+
+    def truncate_torn_line(self, block_size=1 << 16):
+        """Cuts the sidecar back to the end of its last complete line."""
+        try:
+            file = open(self.rows_path(), "rb+")
+        except FileNotFoundError:
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(position - block_size, 0)
+                file.seek(start)
+                newline = file.read(position - start).rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                file.truncate(position)
+
+    def append_records(self, records):
+        with open(self.rows_path(), "a") as file:
+            file.write("".join(json.dumps(record) + "\n" for record in records))
+
+    def delete(self, ids=None, **kwargs):
+        with self.lock:
+            rows = self.repair()
+            ids = [doc_id for doc_id in ids or () if doc_id in rows.positions]
+            if not ids:
+                return True
+            self.append_records([{"delete": ids}])
+            positions = dict(rows.positions)
+            live = rows.live.copy()
+            for doc_id in ids:
+                live[positions.pop(doc_id)] = False
+            self.rows = Rows(
+                rows.ids, rows.texts, rows.metadatas, live, positions, rows.vectors
+            )
+            self.loaded_stamp = self.stamp()
+            # Compact once most rows are dead, so files do not grow forever.
+            if len(rows.ids) - len(positions) > max(len(positions), 1024):
+                self.compact()
+        return True
+
+    def compact(self):
+        """Rewrites the live rows as a new generation and drops the old one."""
+        with self.lock:
+            rows = self.rows
+            old_generation = self.meta["generation"]
+            generation = old_generation + 1
+            kept = np.flatnonzero(rows.live)
+            with open(self.vectors_path(generation), "wb") as file:
+                for start in range(0, len(kept), self.block_rows):
+                    block = kept[start : start + self.block_rows]
+                    file.write(np.ascontiguousarray(rows.vectors[block]).tobytes())
+            with open(self.rows_path(generation), "w") as file:
+                for row in kept:
+                    record = {
+                        "id": rows.ids[row],
+                        "text": rows.texts[row],
+                        "metadata": rows.metadatas[row],
+                    }
+                    file.write(json.dumps(record) + "\n")
+            self.meta["generation"] = generation
+            self.save_meta()
+            for path in (
+                self.vectors_path(old_generation),
+                self.rows_path(old_generation),
+            ):
+                os.remove(path)
+            self.load()
+
+    def delete_collection(self):
+        with self.lock:
+            for file_name in os.listdir(self.path):
+                os.remove(os.path.join(self.path, file_name))
+            self.meta = {"dim": None, "dtype": self.meta["dtype"], "generation": 0}
+            self.load()
+
+    def get(self, ids=None, include=None, **kwargs):
+        """Chroma-style lookup by id, or of every document."""
+        rows = self.refresh()
+        if ids is None:
+            found = np.flatnonzero(rows.live)
+        else:
+            positions = rows.positions
+            found = [positions[doc_id] for doc_id in ids if doc_id in positions]
+        return {
+            "ids": [rows.ids[row] for row in found],
+            "documents": [rows.texts[row] for row in found],
+            "metadatas": [rows.metadatas[row] for row in found],
+        }
+
+    def scores(self, rows, vector):
+        query = np.asarray(vector, dtype=np.float32)
+        scores = np.empty(len(rows.vectors), dtype=np.float32)
+        for start in range(0, len(rows.vectors), self.block_rows):
+            # Widens quantized rows; float32 rows are used in place.
+            block = rows.vectors[start : start + self.block_rows]
+            block = np.asarray(block, dtype=np.float32)
+            scores[start : start + len(block)] = block @ query
+        if self.meta["dtype"] == "int8":
+            scores /= INT8_SCALE
+        scores[~rows.live[: len(scores)]] = -np.inf
+        return scores
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        rows = self.refresh()
+        live = int(rows.live[: len(rows.vectors)].sum())
+        k = min(k, live)
+        if k <= 0:
+            return []
+        scores = self.scores(rows, embedding)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (
+                Document(page_content=rows.texts[row], metadata=rows.metadatas[row]),
+                float(scores[row]),
+            )
+            for row in top
+        ]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)
+        ]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        vector = self.embedding.embed_query(query)
+        return self.similarity_search_by_vector(vector, k)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import config
+
+
+def page_id(url):
+    """Stable short id of a URL, used to name its output files."""
+    return hashlib.sha1(url.encode()).hexdigest()[:16]
+
+
+class PageStore:
+    """Content-addressed store of crawled pages.
+
+    HTML bodies are kept once per content hash under `path`. index.json
+    maps every URL to its hash, ETag and Last-Modified, so later crawls can
+    send conditional requests. `changed` and `seen` track the current run.
+    """
+
+    def __init__(self, path=config.page_store_path):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        self.lock = threading.Lock()
+        self.changed = set()
+        self.seen = set()
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(self.index_path, "r") as file:
+                self.index = json.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def conditional_headers(self, url):
+        entry = self.index.get(url)
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body_path(self, content_hash):
+        return os.path.join(self.path, f"{content_hash}.html")
+
+    def put(self, url, html, etag=None, last_modified=None):
+        """Stores a fetched page; returns True if its content changed."""
+        content_hash = hashlib.sha256(html.encode()).hexdigest()
+        body_path = self.body_path(content_hash)
+        if not os.path.exists(body_path):
+            # Renamed into place, so a crash never leaves a partial body
+            # behind the hash that later runs trust.
+            tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(html)
+            os.replace(tmp_path, body_path)
+        with self.lock:
+            previous = self.index.get(url)
+            self.index[url] = {
+                "hash": content_hash,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self.seen.add(url)
+            changed = previous is None or previous["hash"] != content_hash
+            if changed:
+                self.changed.add(url)
+            return changed
+
+    def mark_unchanged(self, url):
+        with self.lock:
+            self.seen.add(url)
+
+    def page_path(self, url):
+        """Path of the stored body of a URL, or None if it was never fetched."""
+        entry = self.index.get(url)
+        return self.body_path(entry["hash"]) if entry else None
+
+    def read(self, url):
+        body_path = self.page_path(url)
+        if body_path is None:
+            return None
+        try:
+            with open(body_path, "r") as file:
+                return file.read()
+        except OSError as e:
+            logging.error(f"Error reading stored page for {url}: {e}")
+            return None
+
+    def prune(self):
+        """Forgets URLs not seen in this run and returns them.
+
+        Bodies no longer referenced by any URL are deleted.
+        """
+        with self.lock:
+            gone = [url for url in self.index if url not in self.seen]
+            for url in gone:
+                del self.index[url]
+            referenced = {f"{entry['hash']}.html" for entry in self.index.values()}
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(".html") and file_name not in referenced:
+                os.remove(os.path.join(self.path, file_name))
+        return gone
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp"
+        with self.lock:
+            with open(tmp_path, "w") as file:
+                json.dump(self.index, file)
+        os.replace(tmp_path, self.index_path)
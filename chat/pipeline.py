@@ -0,0 +1,17 @@
+from collections import deque
+
+
+def bounded_map(executor, fn, iterable, window):
+    """Like executor.map, but pulls at most `window` items ahead.
+
+    executor.map submits the whole iterable up front and keeps every
+    result until it is consumed. This keeps memory bounded when the input
+    is a lazy stream and the consumer is slower than the workers.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
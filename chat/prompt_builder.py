@@ -0,0 +1,194 @@
+import logging
+from string import Formatter
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import config
+from tokens import count_tokens, head, tail
+
+# A document cut shorter than this is dropped instead.
+MIN_DOCUMENT_TOKENS = 50
+# Chat messages put the parts that change least between turns first. The
+# history only grows between memory compactions, so it comes before the
+# context.
+STABLE_ORDER = ("chat_history", "context", "question")
+
+
+class Prompt:
+    def __init__(self, builder, values, tokens):
+        self.builder = builder
+        self.values = values
+        # Token count per part, for metrics and logs.
+        self.tokens = tokens
+
+    @property
+    def text(self):
+        """The template filled in as written, for the generate API."""
+        return self.builder.render(self.values)
+
+    @property
+    def messages(self):
+        """A static system message, then the parts that change per request."""
+        return self.builder.render_messages(self.values)
+
+
+class PromptBuilder:
+    """Fills the prompt template within fixed token budgets.
+
+    The template's own text is the system part and is never trimmed. The
+    question, chat history and retrieved documents each get a fixed budget,
+    capped by what is left of the model's context window after the system
+    part and the room reserved for the answer. Trimming is deterministic:
+    the question keeps its start, the history keeps its most recent lines,
+    and documents are taken in rank order, the last one cut short if at
+    least MIN_DOCUMENT_TOKENS of it fit.
+
+    For the chat API the template is split into a system message, the text
+    before its first field up to the last blank line, and a user message
+    holding each field under the label that precedes it in the template,
+    in STABLE_ORDER. The system message is byte-identical on every request
+    and the history only grows until ConversationMemory compacts it, so
+    Ollama can reuse its cached prefix and only prefill the new context and
+    question. Turns that compact the memory, or that trim a history over
+    `history_budget`, change the start of the history and prefill it all.
+    """
+
+    def __init__(
+        self,
+        template,
+        context_tokens=config.model_context_tokens,
+        answer_tokens=config.answer_token_reserve,
+        system_budget=config.system_token_budget,
+        question_budget=config.question_token_budget,
+        history_budget=config.history_token_budget,
+        documents_budget=config.context_token_budget,
+    ):
+        self.pieces = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(template)
+        ]
+        self.split_sections()
+        system = "".join(literal for literal, _ in self.pieces)
+        self.system_tokens = count_tokens(system)
+        self.context_tokens = context_tokens
+        self.answer_tokens = answer_tokens
+        self.question_budget = question_budget
+        self.history_budget = history_budget
+        self.documents_budget = documents_budget
+        if self.system_tokens > system_budget:
+            logging.warning(
+                f"Prompt template uses {self.system_tokens} tokens, "
+                f"over its budget of {system_budget}"
+            )
+        total = (
+            max(self.system_tokens, system_budget)
+            + question_budget
+            + history_budget
+            + documents_budget
+            + answer_tokens
+        )
+        if total > context_tokens:
+            logging.warning(
+                f"Prompt budgets add up to {total} tokens, over the "
+                f"{context_tokens} token context; documents are trimmed first"
+            )
+
+    def split_sections(self):
+        self.preamble = ""
+        self.labels = {}
+        self.trailer = ""
+        for literal, field in self.pieces:
+            if field is None:
+                self.trailer = literal.strip()
+                continue
+            if field not in STABLE_ORDER:
+                raise ValueError(f"Unknown prompt template field {field!r}")
+            if not self.labels:
+                self.preamble, _, literal = literal.rpartition("\n\n")
+                self.preamble = self.preamble.strip()
+            self.labels[field] = literal.lstrip()
+
+    def build(self, question, chat_history, docs):
+        available = self.context_tokens - self.answer_tokens - self.system_tokens
+        question = self.trim_question(question, min(self.question_budget, available))
+        available -= count_tokens(question)
+        chat_history = self.trim_history(
+            chat_history, min(self.history_budget, available)
+        )
+        available -= count_tokens(chat_history)
+        context, used = self.fill_documents(
+            docs, min(self.documents_budget, max(available, 0))
+        )
+
+        values = {
+            "question": question,
+            "chat_history": chat_history,
+            "context": context,
+        }
+        tokens = {
+            "system": self.system_tokens,
+            "question": count_tokens(question),
+            "history": count_tokens(chat_history),
+            "documents": count_tokens(context),
+        }
+        tokens["total"] = sum(tokens.values())
+        tokens["documents_used"] = used
+        tokens["documents_dropped"] = len(docs) - used
+        return Prompt(self, values, tokens)
+
+    def render(self, values):
+        return "".join(
+            literal + (values[field] if field is not None else "")
+            for literal, field in self.pieces
+        )
+
+    def render_messages(self, values):
+        parts = []
+        for field in sorted(self.labels, key=STABLE_ORDER.index):
+            parts.extend((self.labels[field], values[field].rstrip(), "\n\n"))
+        if self.trailer:
+            parts.append(self.trailer)
+        messages = [HumanMessage(content="".join(parts).rstrip())]
+        if self.preamble:
+            messages.insert(0, SystemMessage(content=self.preamble))
+        return messages
+
+    def trim_question(self, question, budget):
+        if count_tokens(question) <= budget:
+            return question
+        return head(question, budget)
+
+    def trim_history(self, chat_history, budget):
+        """Keeps the most recent lines that fit, cutting the oldest kept one."""
+        if count_tokens(chat_history) <= budget:
+            return chat_history
+        kept = []
+        remaining = max(budget, 0)
+        for line in reversed(chat_history.splitlines(keepends=True)):
+            tokens = count_tokens(line)
+            if tokens > remaining:
+                if remaining:
+                    kept.append(tail(line, remaining))
+                break
+            kept.append(line)
+            remaining -= tokens
+        return "".join(reversed(kept))
+
+    def fill_documents(self, docs, budget):
+        """Numbers the documents in rank order while they fit the budget."""
+        parts = []
+        used = 0
+        remaining = budget
+        for index, doc in enumerate(docs, start=1):
+            header = f"Document {index}: \n\n"
+            overhead = count_tokens(header + "\n\n")
+            content = doc.page_content
+            tokens = count_tokens(content)
+            if overhead + tokens > remaining:
+                content = head(content, remaining - overhead)
+                tokens = count_tokens(content)
+                if tokens < MIN_DOCUMENT_TOKENS:
+                    break
+            parts.extend((header, content, "\n\n"))
+            remaining -= overhead + tokens
+            used += 1
+        return "".join(parts), used
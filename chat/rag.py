@@ -1,60 +1,226 @@
+import logging
+import re
+import threading
 from operator import itemgetter
 
-from chromadb.config import Settings
-from langchain.prompts import ChatPromptTemplate
-from langchain_community.embeddings import OllamaEmbeddings
+from langchain_community.chat_models import ChatOllama
 from langchain_community.llms import Ollama
-from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 
-from chat import config
+import config
+import metrics
+from cache import LRUCache, SemanticCache
+from embed import collection_version, open_vectorstore
+from embeddings import OllamaBatchEmbeddings
+from keyword_index import KeywordIndex
+from prompt_builder import PromptBuilder
+from reranker import Reranker
+from tokens import count_tokens
 
+_rag = None
+_rag_lock = threading.Lock()
 
-class Rag:
-    def __init__(self):
 
-        self.client_settings = Settings(anonymized_telemetry=False, is_persistent=True)
+def reciprocal_rank_fusion(rankings, k=config.rrf_k):
+    """Merges ranked id lists, scoring each id by the sum of 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
 
-        self.embedding_function = OllamaEmbeddings(
-            base_url=config.ollama_server, model=config.embedding_model_name
-        )
 
-        self.vectorstore = Chroma(
-            persist_directory=config.vector_database_path,
-            embedding_function=self.embedding_function,
-            collection_name=config.collection_name,
-            client_settings=self.client_settings,
-        )
+class Rag:
+    def __init__(self, vectorstore=None, keyword_index=None):
 
-        self.retriever = self.vectorstore.as_retriever(
-            search_kwargs={"k": config.number_of_retrieved_sources}
+        self.embedding_function = OllamaBatchEmbeddings()
+
+        self.vectorstore = vectorstore or open_vectorstore(self.embedding_function)
+
+        self.keyword_index = keyword_index or KeywordIndex.load()
+        self.cache_version = collection_version()
+        self.query_cache = LRUCache(config.query_cache_size, config.query_cache_ttl)
+        self.retrieval_cache = LRUCache(
+            config.query_cache_size, config.query_cache_ttl
         )
+        self.retriever = RunnableLambda(self.retrieve)
+        self.reranker = Reranker() if config.rerank_enabled else None
+        self.answer_cache = None
+        if config.answer_cache_enabled:
+            self.answer_cache = SemanticCache(
+                config.answer_cache_size, config.answer_cache_threshold
+            )
 
-        self.model = Ollama(
+        self.chat = config.generation_mode == "chat"
+        model_class = ChatOllama if self.chat else Ollama
+        self.model = model_class(
             base_url=config.ollama_server,
             model=config.model_name,
             temperature=config.model_temperature,
-            num_ctx=8192,
+            num_ctx=config.model_context_tokens,
+            keep_alive=config.model_keep_alive or None,
         )
 
         self.template = config.base_prompt + config.custom_prompt
 
-        self.prompt_template = ChatPromptTemplate.from_template(self.template)
+        self.prompt_builder = PromptBuilder(self.template)
 
         self.chain = (
-            {
-                "context": itemgetter("question") | self.retriever | self.format_docs,
-                "question": itemgetter("question"),
-                "chat_history": itemgetter("chat_history"),
-            }
-            | self.prompt_template
+            RunnablePassthrough.assign(docs=itemgetter("question") | self.retriever)
+            | RunnableLambda(self.build_prompt)
             | self.model
             | StrOutputParser()
         )
 
-    def format_docs(self, docs):
-        final = ""
-        for idx, doc in enumerate(docs):
-            final += "Document " + str(idx + 1) + ": \n\n" + doc.page_content + "\n\n"
-        # print(final)
-        return final
+    def cache_key(self, question):
+        """Keys the caches on the normalized question and collection version.
+
+        Every cache is dropped, and the keyword index reloaded, when embed.py
+        publishes a new version.
+        """
+        version = collection_version()
+        if version != self.cache_version:
+            self.keyword_index = KeywordIndex.load(self.keyword_index.path)
+            self.query_cache.clear()
+            self.retrieval_cache.clear()
+            # Chunk ids are reused when a file changes, so scores go too.
+            if self.reranker is not None:
+                self.reranker.scores.clear()
+            if self.answer_cache is not None:
+                self.answer_cache.clear()
+            self.cache_version = version
+        return " ".join(re.findall(r"\w+", question.lower())), version
+
+    def embed_query(self, question, key):
+        vector = self.query_cache.get(key)
+        if vector is None:
+            with metrics.embedding_seconds.time():
+                vector = self.embedding_function.embed_query(question)
+            self.query_cache.set(key, vector)
+        return vector
+
+    def fetch_documents(self, ids):
+        result = self.vectorstore.get(ids=ids)
+        return {
+            doc_id: Document(page_content=content, metadata=metadata or {})
+            for doc_id, content, metadata in zip(
+                result["ids"], result["documents"], result["metadatas"]
+            )
+        }
+
+    def get_documents(self, ids):
+        """Fetches documents by id in the given order, or None if any is gone."""
+        found = self.fetch_documents(ids)
+        if len(found) != len(ids):
+            return None
+        return [found[doc_id] for doc_id in ids]
+
+    @metrics.retrieval_seconds.timed
+    def retrieve(self, question):
+        key = self.cache_key(question)
+        ids = self.retrieval_cache.get(key)
+        if ids is not None:
+            docs = self.get_documents(ids)
+            if docs is not None:
+                return docs
+
+        if self.reranker is None:
+            docs = self.search(question, key, k=config.number_of_retrieved_sources)
+        else:
+            # Over-fetch, then keep the best chunks that fit the budget.
+            candidates = self.search(question, key, k=config.rerank_candidates)
+            docs = self.reranker.select(question, key, candidates)
+        ids = [doc.metadata.get("id") for doc in docs]
+        if all(ids):
+            self.retrieval_cache.set(key, ids)
+        return docs
+
+    def search(
+        self,
+        question,
+        key=None,
+        mode=config.retrieval_mode,
+        k=config.number_of_retrieved_sources,
+    ):
+        """Finds the k best documents by vector, keyword or hybrid search.
+
+        Hybrid search fuses the top candidates of both with reciprocal rank
+        fusion; it falls back to vector search while the keyword index is
+        empty or the vectors carry no ids.
+        """
+        key = key or self.cache_key(question)
+        if mode == "keyword":
+            ids = self.keyword_index.search(question, k)
+            found = self.fetch_documents(ids) if ids else {}
+            return [found[doc_id] for doc_id in ids if doc_id in found]
+
+        vector = self.embed_query(question, key)
+        hybrid = mode == "hybrid" and len(self.keyword_index) > 0
+        docs = self.vectorstore.similarity_search_by_vector(
+            vector, k=max(k, config.retrieval_candidates) if hybrid else k
+        )
+        vector_ids = [doc.metadata.get("id") for doc in docs]
+        if not hybrid or not all(vector_ids):
+            return docs[:k]
+
+        keyword_ids = self.keyword_index.search(question, config.retrieval_candidates)
+        ids = reciprocal_rank_fusion([vector_ids, keyword_ids])[:k]
+        found = dict(zip(vector_ids, docs))
+        missing = [doc_id for doc_id in ids if doc_id not in found]
+        if missing:
+            found.update(self.fetch_documents(missing))
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def answer_cacheable(self, chat_history):
+        """Answers are only reused for questions asked with little history."""
+        return (
+            self.answer_cache is not None
+            and count_tokens(chat_history) <= config.answer_cache_max_history_tokens
+        )
+
+    def cached_answer(self, question, chat_history):
+        if not self.answer_cacheable(chat_history):
+            return None
+        vector = self.embed_query(question, self.cache_key(question))
+        return self.answer_cache.lookup(vector)
+
+    def store_answer(self, question, chat_history, answer):
+        if self.answer_cacheable(chat_history) and answer:
+            vector = self.embed_query(question, self.cache_key(question))
+            self.answer_cache.add(vector, answer)
+
+    def cache_stats(self):
+        stats = {
+            "query_vectors": self.query_cache.stats(),
+            "retrievals": self.retrieval_cache.stats(),
+        }
+        if self.reranker is not None:
+            stats["rerank_scores"] = self.reranker.scores.stats()
+        if self.answer_cache is not None:
+            stats["answers"] = self.answer_cache.stats()
+        return stats
+
+    def build_prompt(self, inputs):
+        prompt = self.prompt_builder.build(
+            inputs["question"], inputs["chat_history"], inputs["docs"]
+        )
+        metrics.prompt_tokens.observe(prompt.tokens["total"])
+        metrics.context_tokens.observe(prompt.tokens["documents"])
+        logging.info(f"Prompt tokens: {prompt.tokens}")
+        return prompt.messages if self.chat else prompt.text
+
+
+def get_rag():
+    """Returns the process-wide Rag engine, building it on first use.
+
+    The chain holds no per-conversation state, so every chat session shares
+    the same embeddings client, Chroma client and compiled chain.
+    """
+    global _rag
+    if _rag is None:
+        with _rag_lock:
+            if _rag is None:
+                _rag = Rag()
+    return _rag
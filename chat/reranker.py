@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import threading
+import time
+
+import config
+from cache import LRUCache
+from chunker import batched
+from tokens import count_tokens
+
+
+class Reranker:
+    """Scores (question, chunk) pairs with a small cross-encoder on the CPU.
+
+    The model is only imported and loaded on first use. Pairs are scored in
+    batches of `batch_size`, and every score is cached per normalized
+    question and chunk id, so follow-up and repeated questions skip the
+    model for chunks they have already seen.
+    """
+
+    def __init__(
+        self,
+        model_name=config.reranker_model,
+        batch_size=config.rerank_batch_size,
+        cache_size=config.rerank_cache_size,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.scores = LRUCache(cache_size, config.query_cache_ttl)
+        self.lock = threading.Lock()
+        self.tokenizer = None
+        self.model = None
+
+    def load(self):
+        with self.lock:
+            if self.model is None:
+                from transformers import (
+                    AutoModelForSequenceClassification,
+                    AutoTokenizer,
+                )
+
+                logging.info(f"Loading reranker model '{self.model_name}'")
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                model = AutoModelForSequenceClassification.from_pretrained(
+                    self.model_name
+                )
+                self.model = model.eval()
+
+    def predict(self, question, texts):
+        import torch
+
+        self.load()
+        scores = []
+        for batch in batched(texts, self.batch_size):
+            features = self.tokenizer(
+                [question] * len(batch),
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=512,
+                return_tensors="pt",
+            )
+            with torch.inference_mode():
+                logits = self.model(**features).logits
+            scores.extend(logits[:, 0].tolist())
+        return scores
+
+    def score(self, question, key, docs):
+        """Relevance of every document to the question; higher is better."""
+        keys = [
+            (
+                key,
+                doc.metadata.get("id")
+                or hashlib.sha1(doc.page_content.encode()).hexdigest(),
+            )
+            for doc in docs
+        ]
+        scores = [self.scores.get(pair_key) for pair_key in keys]
+        missing = [idx for idx, score in enumerate(scores) if score is None]
+        if missing:
+            started = time.perf_counter()
+            texts = [docs[idx].page_content for idx in missing]
+            predicted = self.predict(question, texts)
+            for idx, score in zip(missing, predicted):
+                scores[idx] = score
+                self.scores.set(keys[idx], score)
+            logging.info(
+                f"Reranked {len(missing)} chunks in "
+                f"{time.perf_counter() - started:.3f}s"
+            )
+        return scores
+
+    def select(self, question, key, docs, token_budget=config.context_token_budget):
+        """The best-scoring documents, best first, that fit in `token_budget`.
+
+        The best document is always kept, even if it alone is over budget.
+        """
+        ranked = sorted(
+            zip(self.score(question, key, docs), docs),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        selected = []
+        tokens = 0
+        for _, doc in ranked:
+            doc_tokens = count_tokens(doc.page_content)
+            if selected and tokens + doc_tokens > token_budget:
+                continue
+            selected.append(doc)
+            tokens += doc_tokens
+        return selected
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import config
+import metrics
+
+
+class QueueTimeout(Exception):
+    """No generation slot became free before the queue deadline."""
+
+
+class Waiter:
+    def __init__(self, session):
+        self.session = session
+        self.granted = False
+        self.position = 0
+        self.moved = asyncio.Event()
+
+
+class GenerationScheduler:
+    """Caps concurrent generations and shares the slots fairly.
+
+    Each session has its own FIFO queue and free slots go to the sessions
+    in turn, so one user sending many questions cannot starve the others.
+    Waiters are told their position in line as it changes, give up after
+    `queue_timeout` seconds, and are cancelled along with any running
+    generation when their session ends.
+    """
+
+    def __init__(
+        self,
+        max_concurrent=config.generation_concurrency,
+        queue_timeout=config.generation_queue_timeout,
+    ):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.queues = OrderedDict()
+        self.tasks = {}
+
+    def waiting(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def update_metrics(self):
+        metrics.generation_queue_depth.set(self.waiting())
+        metrics.generation_running.set(self.running)
+
+    def reposition(self):
+        """Numbers the waiters in the order the round robin will serve them."""
+        queues = list(self.queues.values())
+        position = 0
+        for turn in range(max(map(len, queues), default=0)):
+            for queue in queues:
+                if turn < len(queue):
+                    position += 1
+                    waiter = queue[turn]
+                    if waiter.position != position:
+                        waiter.position = position
+                        waiter.moved.set()
+        self.update_metrics()
+
+    def grant_next(self):
+        while self.running < self.max_concurrent and self.queues:
+            session, queue = next(iter(self.queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.queues.move_to_end(session)
+            else:
+                del self.queues[session]
+            waiter.granted = True
+            waiter.moved.set()
+            self.running += 1
+        self.reposition()
+
+    def release(self):
+        self.running -= 1
+        self.grant_next()
+
+    def remove(self, waiter):
+        queue = self.queues.get(waiter.session)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self.queues[waiter.session]
+        self.reposition()
+
+    async def acquire(self, session, on_position=None):
+        if self.running < self.max_concurrent and not self.queues:
+            self.running += 1
+            self.update_metrics()
+            return
+        waiter = Waiter(session)
+        self.queues.setdefault(session, deque()).append(waiter)
+        self.reposition()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        try:
+            while not waiter.granted:
+                waiter.moved.clear()
+                if on_position:
+                    await on_position(waiter.position)
+                if waiter.granted:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise QueueTimeout()
+                try:
+                    await asyncio.wait_for(waiter.moved.wait(), remaining)
+                except asyncio.TimeoutError:
+                    if not waiter.granted:
+                        raise QueueTimeout() from None
+        except BaseException:
+            if waiter.granted:
+                self.release()
+            else:
+                self.remove(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, session, on_position=None):
+        """Holds a generation slot for `session` while the block runs."""
+        task = asyncio.current_task()
+        self.tasks.setdefault(session, set()).add(task)
+        started = time.perf_counter()
+        try:
+            await self.acquire(session, on_position)
+            metrics.generation_queue_wait_seconds.observe(
+                time.perf_counter() - started
+            )
+            try:
+                yield
+            finally:
+                self.release()
+        finally:
+            tasks = self.tasks.get(session)
+            tasks.discard(task)
+            if not tasks:
+                del self.tasks[session]
+
+    def cancel(self, session):
+        """Cancels the queued and running generations of a session."""
+        for task in list(self.tasks.get(session, ())):
+            task.cancel()
+
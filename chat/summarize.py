@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from pipeline import bounded_map
+from langchain.chains.summarize import load_summarize_chain
+from langchain.prompts import PromptTemplate
+from langchain_community.llms import Ollama
+from langchain_core.documents import Document
+
+# Bump when the prompts change, so cached summaries made with the old ones
+# are not reused. The model and its temperature are part of the cache key,
+# so changing MODEL_NAME needs no bump.
+PROMPT_VERSION = "1"
+
+PROMPT_TEMPLATE = """Write a concise contextualized text in first-person plural of the following:
+        {text}
+        CONCISE CONTEXTUALIZED TEXT:"""
+REFINE_TEMPLATE = """
+         "Your job is to produce a final contextualized text in first-person plural\n"
+    "We have provided an existing contextualized text up to a certain point: {existing_answer}\n"
+    "We have the opportunity to refine the existing contextualized text"
+    "(only if needed) with some more context below.\n"
+    "------------\n"
+    "{text}\n"
+    "------------\n"
+    "Given the new context, refine the original contextualized text"
+    "If the context isn't useful, return the original contextualized text.
+    REFINED CONTEXTUALIZED TEXT:"
+        """
+
+
+class Summarizer:
+    """Summarization stage shared by every page and PDF of a bootstrap.
+
+    One Ollama client and one chain per summary type serve a pool of
+    `workers` threads. Summaries are cached on disk by content hash, prompt
+    version, model and temperature as soon as each one is done. Unchanged
+    texts are never summarized twice, and a crashed bootstrap resumes where
+    it stopped.
+    """
+
+    def __init__(
+        self, workers=config.summary_workers, cache_path=config.summary_cache_path
+    ):
+        self.cache_path = cache_path
+        os.makedirs(cache_path, exist_ok=True)
+        self.llm = Ollama(
+            base_url=config.ollama_server,
+            model=config.model_name,
+            temperature=0.8,
+            num_ctx=8192,
+        )
+        refine_prompt = PromptTemplate(
+            template=REFINE_TEMPLATE, input_variables=["text", "existing_answer"]
+        )
+        self.chains = {
+            "refine": load_summarize_chain(
+                self.llm,
+                chain_type="refine",
+                refine_prompt=refine_prompt,
+                question_prompt=PromptTemplate.from_template(PROMPT_TEMPLATE),
+            ),
+            "map_reduce": load_summarize_chain(self.llm, chain_type="map_reduce"),
+        }
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cache_file(self, text, type):
+        settings = f"{PROMPT_VERSION}\0{self.llm.model}\0{self.llm.temperature}"
+        key = f"{settings}\0{type}\0{text}".encode()
+        return os.path.join(self.cache_path, f"{hashlib.sha256(key).hexdigest()}.txt")
+
+    def summarize(self, text, type):
+        cache_file = self.cache_file(text, type)
+        if os.path.exists(cache_file):
+            with self.lock:
+                self.hits += 1
+            with open(cache_file, "r") as file:
+                return file.read()
+
+        summary = self.chains[type].invoke(
+            dict(input_documents=[Document(page_content=text)])
+        )["output_text"]
+        tmp_file = f"{cache_file}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "w") as file:
+            file.write(summary)
+        os.replace(tmp_file, cache_file)
+        with self.lock:
+            self.misses += 1
+        logging.info(f"Summarized text with type '{type}'")
+        return summary
+
+    def summarize_all(self, jobs):
+        """Summarizes (text, type) jobs in parallel, yielding summaries in order.
+
+        `jobs` may be a lazy iterable; only a few jobs are read ahead of the
+        consumer. A job that fails yields None instead of its summary.
+        """
+
+        def run(job):
+            try:
+                return self.summarize(*job)
+            except Exception as e:
+                logging.error(f"Error summarizing text: {e}")
+                return None
+
+        started = time.perf_counter()
+        hits, misses = self.hits, self.misses
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="summarize"
+        ) as executor:
+            yield from bounded_map(executor, run, jobs, self.workers * 2)
+
+        done = self.hits - hits + self.misses - misses
+        if done:
+            minutes = (time.perf_counter() - started) / 60
+            logging.info(
+                f"Summarized {done} texts at {done / minutes:.1f} per minute, "
+                f"cache hit rate {(self.hits - hits) / done:.0%}"
+            )
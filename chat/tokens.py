@@ -0,0 +1,85 @@
+import logging
+import math
+import threading
+
+import config
+
+# Used when no tokenizer is configured or it fails to load. Mistral's
+# tokenizer averages about four characters per token on English prose, but
+# code, URLs, numbers and accented text tokenize denser. Three overcounts
+# prose by roughly a quarter, so budgets hold for most pages; text denser
+# than three characters per token is still undercounted, which the answer
+# reserve has to absorb.
+CHARS_PER_TOKEN = 3
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """Returns the configured tokenizer, loading it on first use.
+
+    Returns None, and the character estimate is used, when TOKENIZER_MODEL
+    is unset or the tokenizer cannot be loaded.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = load_tokenizer(config.tokenizer_model)
+    return _tokenizer or None
+
+
+def load_tokenizer(name):
+    if not name:
+        return False
+    try:
+        from transformers import AutoTokenizer
+
+        logging.info(f"Loading tokenizer '{name}'")
+        return AutoTokenizer.from_pretrained(name, use_fast=True)
+    except Exception as e:
+        logging.warning(
+            f"Could not load tokenizer '{name}', estimating "
+            f"{CHARS_PER_TOKEN} characters per token: {e}"
+        )
+        return False
+
+
+def token_offsets(tokenizer, text):
+    """(start, end) character span of each token of the text."""
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    return encoding["offset_mapping"]
+
+
+def count_tokens(text):
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def head(text, tokens):
+    """The longest start of the text that fits in `tokens` tokens."""
+    if tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[: tokens * CHARS_PER_TOKEN]
+    offsets = token_offsets(tokenizer, text)
+    if len(offsets) <= tokens:
+        return text
+    return text[: offsets[tokens - 1][1]]
+
+
+def tail(text, tokens):
+    """The longest end of the text that fits in `tokens` tokens."""
+    if tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[-tokens * CHARS_PER_TOKEN :]
+    offsets = token_offsets(tokenizer, text)
+    if len(offsets) <= tokens:
+        return text
+    return text[offsets[-tokens][0] :]
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+from audio import decode_pcm
+
+
+class TranscriptionPool:
+    """Runs audio decoding and Whisper transcription off the event loop.
+
+    Work goes to a pool of `workers` threads, each loading its own Whisper
+    model on first use; whisper itself is only imported then. At most
+    `max_pending` transcriptions are queued or running; further callers
+    wait for a slot, which is the backpressure.
+    """
+
+    def __init__(
+        self,
+        workers=config.stt_workers,
+        max_pending=config.stt_max_pending,
+        model_name=config.whisper_model,
+    ):
+        self.model_name = model_name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.slots = None
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.count = 0
+        self.queue_wait_seconds = 0.0
+        self.transcription_seconds = 0.0
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="stt"
+        )
+
+    def model(self):
+        if not hasattr(self.local, "model"):
+            import whisper
+
+            logging.info(f"Loading Whisper model '{self.model_name}'")
+            self.local.model = whisper.load_model(self.model_name)
+        return self.local.model
+
+    def warm_up(self):
+        """Loads the model of every worker in the background."""
+        for _ in range(self.workers):
+            self.executor.submit(self.model)
+
+    def run(self, audio_file, submitted_at, conversation):
+        started = time.perf_counter()
+        samples = decode_pcm(audio_file)
+        result = self.model().transcribe(samples, fp16=False)
+        queue_wait = started - submitted_at
+        transcription = time.perf_counter() - started
+        with self.lock:
+            self.count += 1
+            self.queue_wait_seconds += queue_wait
+            self.transcription_seconds += transcription
+        metrics.stt_seconds.observe(transcription, conversation)
+        logging.info(
+            f"Transcribed audio: queue wait {queue_wait:.3f}s, "
+            f"transcription {transcription:.3f}s"
+        )
+        return result["text"]
+
+    async def transcribe(self, audio_file):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_pending)
+        submitted_at = time.perf_counter()
+        # run_in_executor does not carry context variables over to the worker.
+        conversation = metrics.conversation_id.get()
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self.run, audio_file, submitted_at, conversation
+            )
+
+    def stats(self):
+        count = self.count or 1
+        return {
+            "transcriptions": self.count,
+            "mean_queue_wait_s": round(self.queue_wait_seconds / count, 3),
+            "mean_transcription_s": round(self.transcription_seconds / count, 3),
+        }
@@ -0,0 +1,183 @@
+import abc
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import config
+import metrics
+from audio import duration, encode, gtts_mp3, output_format, synthesize
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TTSBackend(abc.ABC):
+    """Turns a piece of text into audio bytes encoded for a mime type."""
+
+    @abc.abstractmethod
+    def synthesize(self, text, mime_type):
+        pass
+
+    def synthesize_timed(self, text, mime_type):
+        """The audio and its playback length in seconds."""
+        audio = self.synthesize(text, mime_type)
+        return audio, duration(audio, output_format(mime_type))
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate text-to-speech; needs network access."""
+
+    def synthesize(self, text, mime_type):
+        return synthesize(text, mime_type)
+
+    def synthesize_timed(self, text, mime_type):
+        # Timed from gTTS's MP3 headers, so no second ffmpeg run is needed.
+        mp3 = gtts_mp3(text)
+        return encode(mp3, output_format(mime_type)), duration(mp3, "mp3")
+
+
+class Pyttsx3Backend(TTSBackend):
+    """Offline text-to-speech through the platform engine (espeak on Linux).
+
+    pyttsx3 can only render to a file, so each call uses its own temporary
+    file. The engine is not thread-safe, so calls are serialized.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, mime_type):
+        return self.synthesize_timed(text, mime_type)[0]
+
+    def synthesize_timed(self, text, mime_type):
+        wav = self.render_wav(text)
+        audio = encode(wav, output_format(mime_type), input_format="wav")
+        return audio, duration(wav, "wav")
+
+    def render_wav(self, text):
+        import pyttsx3
+
+        fd, wav_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            with self.lock:
+                engine = pyttsx3.init()
+                engine.save_to_file(text, wav_path)
+                engine.runAndWait()
+            with open(wav_path, "rb") as file:
+                wav = file.read()
+        finally:
+            os.remove(wav_path)
+        return wav
+
+
+BACKENDS = {"gtts": GTTSBackend, "pyttsx3": Pyttsx3Backend}
+
+
+def get_backend(name=config.tts_backend):
+    return BACKENDS[name]()
+
+
+class SentenceSplitter:
+    """Buffers streamed tokens and hands out complete sentences."""
+
+    def __init__(self, min_chars=config.tts_min_sentence_chars):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token):
+        self.buffer += token
+        parts = SENTENCE_END.split(self.buffer)
+        sentences = []
+        pending = ""
+        for part in parts[:-1]:
+            pending += part + " "
+            # Short fragments ("Hi.", "1.") are merged into the next sentence.
+            if len(pending) >= self.min_chars:
+                sentences.append(pending.strip())
+                pending = ""
+        self.buffer = pending + parts[-1]
+        return sentences
+
+    def flush(self):
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+
+class SentenceSpeaker:
+    """Speaks an answer sentence by sentence while it is still generating.
+
+    Sentences are synthesized concurrently, at most `concurrency` at a
+    time, and handed in order to `send(audio, index)`. Each segment is sent
+    once the previous one has finished playing so they do not overlap.
+    `close()` stops delivery and drops sentences not yet synthesized; call
+    it when the answer is abandoned.
+    """
+
+    def __init__(
+        self, send, mime_type, backend=None, concurrency=config.tts_concurrency
+    ):
+        self.send = send
+        self.mime_type = mime_type
+        self.backend = backend or get_backend()
+        self.splitter = SentenceSplitter()
+        self.slots = asyncio.Semaphore(concurrency)
+        self.segments = asyncio.Queue()
+        self.started = time.perf_counter()
+        self.first_audio = None
+        self.renders = set()
+        self.delivery = asyncio.create_task(self.deliver())
+
+    def feed(self, token):
+        for sentence in self.splitter.feed(token):
+            self.speak(sentence)
+
+    def speak(self, sentence):
+        task = asyncio.create_task(self.render(sentence))
+        self.renders.add(task)
+        task.add_done_callback(self.renders.discard)
+        self.segments.put_nowait(task)
+
+    async def render(self, sentence):
+        async with self.slots:
+            with metrics.tts_seconds.time():
+                return await asyncio.to_thread(self.render_sync, sentence)
+
+    def render_sync(self, sentence):
+        return self.backend.synthesize_timed(sentence, self.mime_type)
+
+    async def deliver(self):
+        index = 0
+        playing_until = 0.0
+        while True:
+            segment = await self.segments.get()
+            if segment is None:
+                return
+            try:
+                audio, seconds = await segment
+            except Exception as e:
+                logging.error(f"Error synthesizing speech: {e}")
+                continue
+            await asyncio.sleep(max(0.0, playing_until - time.perf_counter()))
+            if self.first_audio is None:
+                self.first_audio = time.perf_counter() - self.started
+                logging.info(f"Time to first audio: {self.first_audio:.3f}s")
+            index += 1
+            await self.send(audio, index)
+            playing_until = time.perf_counter() + seconds
+
+    async def finish(self):
+        for sentence in self.splitter.flush():
+            self.speak(sentence)
+        self.segments.put_nowait(None)
+        await self.delivery
+
+    def close(self):
+        """Cancels delivery and pending sentences. A sentence already being
+        synthesized finishes in its thread and is discarded."""
+        self.delivery.cancel()
+        for task in list(self.renders):
+            task.cancel()
@@ -12,6 +12,6 @@ export DATA_PATH="${STORAGE}/data"
 [ -d ${DATA_PATH} ] || mkdir -p ${DATA_PATH}
 
 [ -n "$(ls -A $DATA_PATH)" ] || python chat/bootstrap.py
-[ -n "$(ls -A $VECTOR_DATABASE_PATH)" ] || python chat/embed.py
+python chat/embed.py
 
 chainlit run chat/app.py -h 
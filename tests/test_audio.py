@@ -0,0 +1,61 @@
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from audio import SAMPLE_RATE, decode_pcm, duration, mp3_duration
+from benchmarks.voice import tone_wav
+
+needs_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpeg is not installed"
+)
+
+
+def peak_frequency(samples):
+    spectrum = np.abs(np.fft.rfft(samples))
+    return np.argmax(spectrum) * SAMPLE_RATE / len(samples)
+
+
+@needs_ffmpeg
+def test_decode_pcm_returns_mono_float32_at_sample_rate():
+    samples = decode_pcm(tone_wav(440, seconds=0.5, sample_rate=8000))
+    assert samples.dtype == np.float32
+    assert len(samples) == SAMPLE_RATE // 2
+    assert np.abs(samples).max() <= 1.0
+    assert peak_frequency(samples) == pytest.approx(440, abs=2)
+
+
+@needs_ffmpeg
+def test_concurrent_decodes_keep_their_own_audio():
+    frequencies = [220 + 40 * idx for idx in range(8)]
+    inputs = [tone_wav(frequency) for frequency in frequencies]
+    with ThreadPoolExecutor(max_workers=len(inputs)) as executor:
+        outputs = list(executor.map(decode_pcm, inputs))
+    for frequency, samples in zip(frequencies, outputs):
+        assert peak_frequency(samples) == pytest.approx(frequency, abs=2)
+
+
+@needs_ffmpeg
+def test_decode_pcm_rejects_invalid_audio():
+    with pytest.raises(RuntimeError, match="ffmpeg failed"):
+        decode_pcm(b"not audio")
+
+
+def mp3_frames(count):
+    """MPEG-2 Layer III frames, 24 kHz and 32 kbps: 96 bytes of 576 samples."""
+    header = bytes((0xFF, 0xF3, 0x44, 0xC4))
+    return header.ljust(96, b"\0") * count
+
+
+def test_mp3_duration_from_frame_headers():
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"\0" * 5
+    assert mp3_duration(mp3_frames(250)) == 6.0
+    assert mp3_duration(id3 + mp3_frames(250) + b"TAG" + b"\0" * 125) == 6.0
+    assert mp3_duration(b"not audio") is None
+
+
+def test_duration_reads_headers_without_ffmpeg(monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    assert duration(mp3_frames(50), "mp3") == 1.2
+    assert duration(tone_wav(440, seconds=0.5), "wav") == 0.5
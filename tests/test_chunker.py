@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+from chunker import batched, iter_file_chunks, iter_text_chunks, metadata_header
+
+TEXT = "\n\n".join(
+    " ".join(f"word{paragraph}_{idx}" for idx in range(30)) for paragraph in range(8)
+)
+
+
+def chunks(text, chunk_size, chunk_overlap):
+    return list(iter_text_chunks(io.StringIO(text), chunk_size, chunk_overlap))
+
+
+def test_chunks_fit_and_point_back_into_the_text():
+    result = chunks(TEXT, 200, 40)
+    assert len(result) > 1
+    for offset, chunk in result:
+        assert len(chunk) <= 200
+        assert TEXT[offset : offset + len(chunk)] == chunk
+    assert result[-1][0] + len(result[-1][1]) == len(TEXT)
+
+
+def test_consecutive_chunks_overlap_on_word_boundaries():
+    result = chunks(TEXT, 200, 40)
+    for (offset, chunk), (next_offset, _) in zip(result, result[1:]):
+        assert offset < next_offset < offset + len(chunk)
+        assert TEXT[next_offset - 1] in " \n"
+
+
+def test_prefers_paragraph_breaks():
+    text = "a" * 60 + "\n\n" + "b " * 40
+    assert chunks(text, 100, 0)[0] == (0, "a" * 60 + "\n\n")
+
+
+def test_short_and_blank_text():
+    assert chunks("short text", 100, 10) == [(0, "short text")]
+    assert chunks("   \n\n ", 100, 10) == []
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        chunks(TEXT, 100, 100)
+
+
+def test_file_chunks_carry_the_metadata_header(tmp_path):
+    path = tmp_path / "page.txt"
+    path.write_text(metadata_header({"url": "https://example.com/"}) + TEXT)
+    docs = list(iter_file_chunks(str(path), chunk_size=300, chunk_overlap=0))
+    assert "".join(doc.page_content for doc in docs) == TEXT
+    assert docs[1].metadata == {
+        "url": "https://example.com/",
+        "source": "page.txt",
+        "start_index": len(docs[0].page_content),
+    }
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,119 @@
+import functools
+
+import pytest
+from langchain_community.vectorstores import Chroma
+
+import config
+import embed
+from benchmarks.vectorstore import FixtureEmbeddings
+from chromadb.config import Settings
+from embed import document_id, embed_folder, load_manifest, untracked_collection
+from keyword_index import KeywordIndex
+from numpy_store import NumpyVectorStore
+
+
+def paragraphs(name, count):
+    text = "word " * 80
+    return "\n\n".join(f"{name} paragraph {idx} {text}" for idx in range(count))
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "embedding_manifest_path", str(tmp_path / "manifest"))
+    # Chroma keeps one client per process; a fresh collection per test.
+    monkeypatch.setattr(config, "collection_name", f"test-{tmp_path.name}")
+    data = tmp_path / "data"
+    data.mkdir()
+    return tmp_path, data
+
+
+def open_store(kind, path):
+    if kind == "numpy":
+        return NumpyVectorStore(FixtureEmbeddings(16), path=str(path / "numpy"))
+    return Chroma(
+        persist_directory=str(path / "chroma"),
+        embedding_function=FixtureEmbeddings(16),
+        collection_name=config.collection_name,
+        client_settings=Settings(anonymized_telemetry=False, is_persistent=True),
+    )
+
+
+def run(store, path, data):
+    keyword_index = KeywordIndex.load(str(path / "keywords"))
+    manifest = load_manifest()
+    changed = embed_folder(store, keyword_index, manifest, str(data))
+    keyword_index.save()
+    return changed, manifest, keyword_index
+
+
+def stored_ids(store):
+    return set(store.get(include=[])["ids"])
+
+
+@pytest.mark.parametrize("kind", ["numpy", "chroma"])
+def test_only_changed_files_are_embedded_and_stale_ids_dropped(workspace, kind):
+    path, data = workspace
+    store = open_store(kind, path)
+    (data / "a.txt").write_text(paragraphs("a", 6))
+    (data / "b.txt").write_text(paragraphs("b", 2))
+    (data / "c.txt").write_text(paragraphs("c", 2))
+
+    changed, manifest, keywords = run(store, path, data)
+    assert changed
+    a_ids = manifest["files"]["a.txt"]["ids"]
+    assert len(a_ids) > 2
+    assert stored_ids(store) == keywords.ids()
+    assert len(stored_ids(store)) == sum(
+        len(entry["ids"]) for entry in manifest["files"].values()
+    )
+
+    assert run(store, path, data)[0] is False
+
+    # a.txt shrinks to one chunk: its later chunks go stale. c.txt is removed.
+    (data / "a.txt").write_text("a is short now")
+    (data / "c.txt").unlink()
+    b_before = store.get(ids=manifest["files"]["b.txt"]["ids"])["documents"]
+    changed, manifest, keywords = run(store, path, data)
+    assert changed
+    assert sorted(manifest["files"]) == ["a.txt", "b.txt"]
+    assert manifest["files"]["a.txt"]["ids"] == [document_id("a.txt", 0)]
+    assert store.get(ids=[document_id("a.txt", 0)])["documents"] == ["a is short now"]
+    expected = {document_id("a.txt", 0), *manifest["files"]["b.txt"]["ids"]}
+    assert stored_ids(store) == expected
+    assert keywords.ids() == expected
+    assert store.get(ids=manifest["files"]["b.txt"]["ids"])["documents"] == b_before
+
+
+@pytest.mark.parametrize("kind", ["numpy", "chroma"])
+def test_untracked_collection(workspace, kind):
+    path, data = workspace
+    store = open_store(kind, path)
+    assert not untracked_collection(store)
+
+    store.add_texts(["built before the manifest"], ids=["random-id"])
+    assert untracked_collection(store)
+
+    (data / "a.txt").write_text("tracked")
+    embed.save_manifest(load_manifest())
+    assert not untracked_collection(store)
+
+
+def test_main_rebuilds_an_untracked_collection(workspace, monkeypatch):
+    path, data = workspace
+    store = open_store("chroma", path)
+    store.add_texts(["whole file from an old build"], ids=["random-id"])
+    (data / "a.txt").write_text(paragraphs("a", 3))
+
+    monkeypatch.setattr(config, "data_path", str(data))
+    monkeypatch.setattr("sys.argv", ["embed.py"])
+    monkeypatch.setattr(embed, "OllamaBatchEmbeddings", lambda: FixtureEmbeddings(16))
+    monkeypatch.setattr(embed, "open_vectorstore", lambda _: open_store("chroma", path))
+    load = functools.partial(KeywordIndex.load, str(path / "keywords"))
+    monkeypatch.setattr(KeywordIndex, "load", load)
+    embed.main()
+
+    manifest = load_manifest()
+    assert manifest["version"] == 1
+    store = open_store("chroma", path)
+    assert stored_ids(store) == set(manifest["files"]["a.txt"]["ids"])
+    assert KeywordIndex.load().ids() == stored_ids(store)
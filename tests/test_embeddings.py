@@ -0,0 +1,54 @@
+import pytest
+import requests
+
+from benchmarks.fake_ollama import DIMENSIONS, FakeOllama, fake_embedding
+from embeddings import OllamaBatchEmbeddings
+
+
+def client(fake, **kwargs):
+    return OllamaBatchEmbeddings(base_url=fake.url, retry_backoff=0, **kwargs)
+
+
+def test_embed_documents_sends_batches_and_keeps_order():
+    texts = [f"text number {idx}" for idx in range(10)]
+    with FakeOllama() as fake:
+        vectors = client(fake, batch_size=4, concurrency=2).embed_documents(texts)
+    assert fake.requests == {"/api/embed": 3}
+    assert len(vectors) == len(texts)
+    for text, vector in zip(texts, vectors):
+        assert vector == pytest.approx(fake_embedding(f"passage: {text}"))
+
+
+def test_embed_query_uses_the_query_instruction():
+    with FakeOllama() as fake:
+        vector = client(fake).embed_query("contact")
+    assert vector == pytest.approx(fake_embedding("query: contact"))
+
+
+def test_falls_back_to_single_text_endpoint():
+    with FakeOllama(missing={"/api/embed"}) as fake:
+        embeddings = client(fake, batch_size=8)
+        vectors = embeddings.embed_documents(["one", "two", "three"])
+        embeddings.embed_query("four")
+    assert fake.requests == {"/api/embed": 1, "/api/embeddings": 4}
+    assert vectors[1] == pytest.approx(fake_embedding("passage: two"))
+
+
+def test_missing_model_raises():
+    with FakeOllama(missing={"/api/embed", "/api/embeddings"}) as fake:
+        with pytest.raises(requests.RequestException, match="not found"):
+            client(fake).embed_query("hello")
+
+
+def test_retries_server_errors():
+    with FakeOllama(failures=2) as fake:
+        vector = client(fake, max_retries=3).embed_query("hello")
+    assert len(vector) == DIMENSIONS
+    assert fake.requests == {"/api/embed": 3}
+
+
+def test_gives_up_after_max_retries():
+    with FakeOllama(failures=5) as fake:
+        with pytest.raises(requests.RequestException, match="after 3 attempts"):
+            client(fake, max_retries=2).embed_query("hello")
+    assert fake.requests == {"/api/embed": 3}
@@ -0,0 +1,85 @@
+from bs4 import BeautifulSoup
+
+from extract import NearDuplicateIndex, SiteExtractor, iter_blocks, minhash
+
+NAV = "<nav><a href='/'>Home</a> <a href='/about'>About us</a></nav>"
+FOOTER = "<footer><p>© Example Ltd. All rights reserved.</p></footer>"
+
+
+def article(topic, words=120, changed=None):
+    words = [f"{topic}{idx % 37}" for idx in range(words)]
+    if changed is not None:
+        words[changed] = "different"
+    return " ".join(words)
+
+
+def page(title, body):
+    return (
+        f"<html><head><title>{title}</title><style>p {{}}</style></head>"
+        f"<body>{NAV}<main><h1>{title}</h1><p>{body}</p></main>{FOOTER}</body>"
+        "</html>"
+    )
+
+
+def write_site(tmp_path, pages):
+    jobs = []
+    for idx, (url, html) in enumerate(pages.items()):
+        body_path = tmp_path / f"{idx}.html"
+        body_path.write_text(html)
+        jobs.append((url, str(body_path)))
+    return jobs
+
+
+def test_blocks_group_inline_text_and_skip_scripts():
+    soup = BeautifulSoup(
+        "<body><p>Hello <b>bold</b>\n  world</p><script>x = 1</script>"
+        "<ul><li>One</li><li>Two</li></ul></body>",
+        "lxml",
+    )
+    assert [text for _, text in iter_blocks(soup)] == ["Hello bold world", "One", "Two"]
+
+
+def test_minhash_tolerates_small_edits():
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.add("a", minhash(article("alpha"))) is None
+    assert index.add("b", minhash(article("alpha", changed=60))) == "a"
+    assert index.add("c", minhash(article("bravo"))) is None
+    assert minhash("   ") is None
+
+
+def run_site(tmp_path, workers):
+    site = {
+        f"https://example.com/{topic}": page(topic.title(), article(topic))
+        for topic in ("alpha", "bravo", "charlie", "delta")
+    }
+    site["https://example.com/alpha?ref=home"] = page(
+        "Alpha", article("alpha", changed=60)
+    )
+    site["https://example.com/empty"] = f"<html><body>{NAV}{FOOTER}</body></html>"
+    extractor = SiteExtractor(workers=workers, min_pages=3, page_ratio=0.3)
+    return extractor, list(extractor.run(write_site(tmp_path, site)))
+
+
+def test_site_drops_boilerplate_and_near_duplicates(tmp_path):
+    extractor, pages = run_site(tmp_path, workers=1)
+    assert [url for url, _, _ in pages] == [
+        "https://example.com/alpha",
+        "https://example.com/bravo",
+        "https://example.com/delta",
+        "https://example.com/charlie",
+    ]
+    assert extractor.boilerplate == [
+        "Home About us",
+        "© Example Ltd. All rights reserved.",
+    ]
+    assert extractor.duplicates == {
+        "https://example.com/alpha?ref=home": "https://example.com/alpha"
+    }
+    assert extractor.empty == ["https://example.com/empty"]
+    url, title, text = pages[0]
+    assert title == "Alpha"
+    assert text == f"Alpha\n\n{article('alpha')}"
+
+
+def test_site_is_the_same_across_worker_processes(tmp_path):
+    assert run_site(tmp_path, workers=2)[1] == run_site(tmp_path, workers=1)[1]
@@ -0,0 +1,63 @@
+import asyncio
+import sqlite3
+
+from history import ChatHistoryStore
+
+
+def stored(database_file):
+    with sqlite3.connect(database_file) as con:
+        return con.execute(
+            "SELECT conversation_id, message_content, role FROM chat_history "
+            "ORDER BY id"
+        ).fetchall()
+
+
+def recording(store):
+    batches = []
+    write = store.write
+
+    def record(rows):
+        batches.append(len(rows))
+        write(rows)
+
+    store.write = record
+    return batches
+
+
+def messages(count):
+    return [(f"c{idx % 3}", f"message {idx}", "user") for idx in range(count)]
+
+
+def test_queued_messages_are_written_in_batches(tmp_path):
+    database_file = str(tmp_path / "history.db")
+    store = ChatHistoryStore(database_file, batch_size=4)
+    batches = recording(store)
+
+    async def main():
+        for message in messages(10):
+            await store.save(*message)
+        await store.flush()
+
+    asyncio.run(main())
+    store.close()
+    assert batches == [4, 4, 2]
+    assert stored(database_file) == messages(10)
+
+
+def test_close_writes_what_is_still_queued(tmp_path):
+    database_file = str(tmp_path / "history.db")
+    store = ChatHistoryStore(database_file, batch_size=4)
+    batches = recording(store)
+
+    async def main():
+        for message in messages(10):
+            await store.save(*message)
+        # Let the writer take one batch, then end the loop without flushing.
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert not store.queue.empty()
+    store.close()
+    assert batches == [4, 6]
+    assert stored(database_file) == messages(10)
+    assert store.con is None
@@ -0,0 +1,49 @@
+from keyword_index import KeywordIndex
+from rag import reciprocal_rank_fusion
+
+
+def build(path):
+    index = KeywordIndex(str(path))
+    index.add("services", "We offer managed DevOps services and cloud hosting.")
+    index.add("contact", "Contact us by email or phone; our office is in Porto.")
+    index.add("clients", "Our clients include banks and retailers.")
+    return index
+
+
+def test_search_ranks_exact_terms_first(tmp_path):
+    index = build(tmp_path / "index.json")
+    assert index.search("DevOps", 3) == ["services"]
+    assert index.search("porto office phone", 1) == ["contact"]
+    assert index.search("unknown words", 3) == []
+
+
+def test_add_replaces_and_remove_forgets(tmp_path):
+    index = build(tmp_path / "index.json")
+    index.add("services", "We design mobile apps.")
+    assert index.search("DevOps", 3) == []
+    assert index.search("mobile", 3) == ["services"]
+    index.remove("contact")
+    index.remove("missing")
+    assert index.ids() == {"services", "clients"}
+    assert "porto" not in index.postings
+    assert index.total_length == sum(length for length, _ in index.documents.values())
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "index.json"
+    build(path).save()
+    loaded = KeywordIndex.load(str(path))
+    assert len(loaded) == 3
+    assert loaded.search("banks", 3) == ["clients"]
+
+
+def test_load_starts_empty_without_a_readable_file(tmp_path):
+    assert len(KeywordIndex.load(str(tmp_path / "missing.json"))) == 0
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+    assert len(KeywordIndex.load(str(broken))) == 0
+
+
+def test_reciprocal_rank_fusion_favours_ids_ranked_by_both():
+    fused = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=60)
+    assert fused == ["b", "a", "c"]
@@ -0,0 +1,57 @@
+from memory import SUMMARY_PREFIX, ConversationMemory
+from tokens import count_tokens
+
+ANSWER = "We can help you plan, build and operate your software. " * 2
+
+
+def fill(memory, turns):
+    for turn in range(turns):
+        memory.add(f"question {turn}", ANSWER)
+
+
+def test_keeps_recent_turns_within_the_budget():
+    memory = ConversationMemory(token_budget=200, max_turns=20, summary_questions=2)
+    fill(memory, 10)
+    history = memory.render()
+    assert memory.tokens <= 200
+    assert memory.tokens == sum(tokens for _, _, tokens in memory.turns)
+    assert history.startswith(SUMMARY_PREFIX)
+    assert "Human: question 9\n" in history
+    assert "Human: question 0\n" not in history
+    oldest = int(memory.turns[0][0].split()[-1])
+    assert list(memory.earlier_questions) == [
+        f"question {turn}" for turn in (oldest - 2, oldest - 1)
+    ]
+
+
+def test_latest_turn_is_kept_even_over_budget():
+    memory = ConversationMemory(token_budget=5)
+    memory.add("a long question", ANSWER)
+    assert len(memory.turns) == 1
+    assert memory.tokens == count_tokens(memory.turns[0][1])
+
+
+def test_compacts_on_max_turns():
+    memory = ConversationMemory(token_budget=10**6, max_turns=4, compact_ratio=0.5)
+    fill(memory, 5)
+    assert [human for human, _, _ in memory.turns] == ["question 3", "question 4"]
+    assert memory.compactions == 1
+
+
+def test_history_keeps_its_start_between_compactions():
+    memory = ConversationMemory(token_budget=300, max_turns=20, compact_ratio=0.5)
+    rewrites = 0
+    previous = ""
+    for turn in range(30):
+        memory.add(f"question {turn}", ANSWER)
+        history = memory.render()
+        rewrites += not history.startswith(previous)
+        previous = history
+    assert rewrites == memory.compactions
+    assert 1 < memory.compactions < 10
+
+
+def test_no_summary_when_disabled():
+    memory = ConversationMemory(token_budget=50, summary_questions=0)
+    fill(memory, 5)
+    assert not memory.render().startswith(SUMMARY_PREFIX)
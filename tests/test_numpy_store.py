@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.vectorstore import FixtureEmbeddings
+from numpy_store import NumpyVectorStore
+
+DIM = 16
+WORDS = ["alpha", "bravo", "charlie", "delta"]
+
+
+def open_store(path, dtype="float32"):
+    return NumpyVectorStore(FixtureEmbeddings(DIM), path=str(path), dtype=dtype)
+
+
+def top(store, text):
+    return store.similarity_search(text, k=1)[0].page_content
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_search_finds_each_text(tmp_path, dtype):
+    store = open_store(tmp_path, dtype)
+    store.add_texts(WORDS, [{"word": word} for word in WORDS], ids=WORDS)
+    reopened = open_store(tmp_path, dtype)
+    for word in WORDS:
+        assert top(reopened, word) == word
+    vector = reopened.embeddings.embed_query(WORDS[0])
+    doc, score = reopened.similarity_search_with_score_by_vector(vector, k=1)[0]
+    assert doc.metadata == {"word": WORDS[0]}
+    assert score == pytest.approx(1.0, abs=0.02)
+
+
+def test_upsert_replaces_the_row(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(["alpha", "bravo"], ids=["a", "b"])
+    store.add_texts(["charlie"], ids=["a"])
+    reopened = open_store(tmp_path)
+    assert reopened.get(["a"])["documents"] == ["charlie"]
+    assert sorted(reopened.get()["ids"]) == ["a", "b"]
+    texts = [doc.page_content for doc in reopened.similarity_search("alpha", k=5)]
+    assert sorted(texts) == ["bravo", "charlie"]
+
+
+def test_delete_hides_rows(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(WORDS, ids=WORDS)
+    store.delete(["bravo", "missing"])
+    reopened = open_store(tmp_path)
+    assert sorted(reopened.get()["ids"]) == ["alpha", "charlie", "delta"]
+    found = reopened.similarity_search("bravo", k=4)
+    assert "bravo" not in [doc.page_content for doc in found]
+
+
+def test_compact_keeps_live_rows_only(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(WORDS, ids=WORDS)
+    store.delete(["alpha", "charlie"])
+    store.compact()
+    files = sorted(os.listdir(tmp_path))
+    assert files == ["meta.json", "rows.1.jsonl", "vectors.1.bin"]
+    reopened = open_store(tmp_path)
+    assert reopened.rows.ids == ["bravo", "delta"]
+    assert top(reopened, "delta") == "delta"
+    reopened.add_texts(["echo"], ids=["echo"])
+    assert top(open_store(tmp_path), "echo") == "echo"
+
+
+def test_vectors_without_a_sidecar_line_are_dropped(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(["alpha"], ids=["a"])
+    # A writer killed between writing a vector and its sidecar line.
+    with open(store.vectors_path(), "ab") as file:
+        file.write(store.quantize(store.rows.vectors[:1]).tobytes())
+
+    store = open_store(tmp_path)
+    store.add_texts(["bravo", "charlie"], ids=["b", "c"])
+    for word in ("alpha", "bravo", "charlie"):
+        assert top(store, word) == word
+        assert top(open_store(tmp_path), word) == word
+
+
+def test_torn_sidecar_line_is_cut_before_appending(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(["alpha"], ids=["a"])
+    with open(store.rows_path(), "a") as file:
+        file.write(json.dumps({"id": "b", "text": "bravo", "metadata": {}})[:20])
+
+    store = open_store(tmp_path)
+    assert store.rows.ids == ["a"]
+    store.add_texts(["charlie"], ids=["c"])
+    store.delete(["a"])
+    reopened = open_store(tmp_path)
+    assert reopened.get()["ids"] == ["c"]
+    assert top(reopened, "charlie") == "charlie"
@@ -0,0 +1,124 @@
+import re
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import tokens
+from prompt_builder import MIN_DOCUMENT_TOKENS, PromptBuilder
+
+TEMPLATE = (
+    "You answer questions about our company.\n\n"
+    "Be brief.\n\n"
+    "Context: {context}\n\n"
+    "History: {chat_history}\n\n"
+    "Question: {question}\n"
+    "Answer:"
+)
+
+
+class WordTokenizer:
+    """Stands in for a Hugging Face tokenizer: one token per word."""
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        spans = [match.span() for match in re.finditer(r"\s*\S+", text)]
+        return {"input_ids": spans, "offset_mapping": spans}
+
+
+@pytest.fixture(params=["estimate", "tokenizer"])
+def tokenizer(request, monkeypatch):
+    if request.param == "tokenizer":
+        monkeypatch.setattr(tokens, "_tokenizer", WordTokenizer())
+    else:
+        monkeypatch.setattr(tokens, "_tokenizer", False)
+
+
+def builder(**budgets):
+    budgets = {
+        "context_tokens": 4000,
+        "answer_tokens": 500,
+        "question_budget": 100,
+        "history_budget": 200,
+        "documents_budget": 1000,
+        **budgets,
+    }
+    return PromptBuilder(TEMPLATE, **budgets)
+
+
+def docs(count, words=200):
+    return [
+        Document(page_content=" ".join(f"doc{idx}word{n}" for n in range(words)))
+        for idx in range(count)
+    ]
+
+
+def test_fills_the_template_when_everything_fits(tokenizer):
+    prompt = builder().build("What do you do?", "Human: hi\nAI: hello\n", docs(1, 20))
+    assert prompt.text == TEMPLATE.format(
+        context=f"Document 1: \n\n{docs(1, 20)[0].page_content}\n\n",
+        chat_history="Human: hi\nAI: hello\n",
+        question="What do you do?",
+    )
+    assert prompt.tokens["documents_used"] == 1
+    assert prompt.tokens["documents_dropped"] == 0
+
+
+def test_parts_are_trimmed_to_their_budgets(tokenizer):
+    question = "why " * 500
+    history = "".join(f"Human: q{turn}\nAI: {'answer ' * 20}\n" for turn in range(50))
+    prompt = builder().build(question, history, docs(10))
+    assert prompt.tokens["question"] <= 100
+    assert prompt.values["question"].startswith("why why")
+    assert prompt.tokens["history"] <= 200
+    assert prompt.values["chat_history"].endswith(history.splitlines()[-1] + "\n")
+    assert prompt.tokens["documents"] <= 1000
+    assert prompt.tokens["documents_used"] + prompt.tokens["documents_dropped"] == 10
+    assert prompt.tokens["total"] == sum(
+        prompt.tokens[part] for part in ("system", "question", "history", "documents")
+    )
+
+
+def test_documents_stay_in_rank_order_and_short_cuts_are_dropped(tokenizer):
+    ranked = docs(3)
+    full = tokens.count_tokens(f"Document 1: \n\n{ranked[0].page_content}\n\n")
+    budget = full + MIN_DOCUMENT_TOKENS // 2
+    prompt = builder(documents_budget=budget).build("q", "", ranked)
+    assert prompt.values["context"].startswith("Document 1: \n\ndoc0word0")
+    assert "doc1word0" not in prompt.values["context"]
+    assert prompt.tokens["documents_used"] == 1
+
+
+def test_chat_messages_keep_a_stable_system_message(tokenizer):
+    first = builder().build("first?", "", docs(1, 20)).messages
+    history = "Human: first?\nAI: yes\n"
+    second = builder().build("second?", history, docs(2, 20)).messages
+    assert isinstance(first[0], SystemMessage)
+    assert first[0].content == second[0].content == (
+        "You answer questions about our company.\n\nBe brief."
+    )
+    assert isinstance(second[1], HumanMessage)
+    content = second[1].content
+    assert content.startswith("History: Human: first?")
+    assert content.index("History:") < content.index("Context:")
+    assert content.index("Context:") < content.index("Question: second?")
+    assert content.endswith("Answer:")
+
+
+def test_unknown_template_field_raises():
+    with pytest.raises(ValueError, match="summary"):
+        PromptBuilder("Summary: {summary}\n\nQuestion: {question}")
+
+
+def test_head_and_tail_cut_on_token_boundaries(monkeypatch):
+    monkeypatch.setattr(tokens, "_tokenizer", WordTokenizer())
+    assert tokens.count_tokens("one two three four") == 4
+    assert tokens.head("one two three four", 2) == "one two"
+    assert tokens.tail("one two three four", 2) == " three four"
+    assert tokens.head("one two", 5) == "one two"
+    assert tokens.tail("one two", 0) == ""
+
+
+def test_estimate_is_conservative(monkeypatch):
+    monkeypatch.setattr(tokens, "_tokenizer", False)
+    assert tokens.count_tokens("x" * 30) == 30 // tokens.CHARS_PER_TOKEN
+    assert tokens.head("abcdefgh", 2) == "abcdef"[: 2 * tokens.CHARS_PER_TOKEN]
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from scheduler import GenerationScheduler, QueueTimeout
+
+
+def test_caps_concurrent_generations():
+    scheduler = GenerationScheduler(max_concurrent=2, queue_timeout=5)
+    running = []
+
+    async def job():
+        async with scheduler.slot("session"):
+            running.append(scheduler.running)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(job() for _ in range(6)))
+
+    asyncio.run(main())
+    assert len(running) == 6
+    assert max(running) == 2
+    assert scheduler.running == 0
+    assert scheduler.waiting() == 0
+
+
+def test_slots_go_to_sessions_in_turn():
+    scheduler = GenerationScheduler(max_concurrent=1, queue_timeout=5)
+    jobs = (("a", "a0"), ("a", "a1"), ("a", "a2"), ("b", "b1"))
+    order = []
+    positions = []
+
+    async def job(session, name, gate):
+        async def on_position(position):
+            if name == "b1":
+                positions.append(position)
+
+        async with scheduler.slot(session, on_position):
+            order.append(name)
+            await gate.wait()
+
+    async def main():
+        gates = [asyncio.Event() for _ in jobs]
+        tasks = []
+        for (session, name), gate in zip(jobs, gates):
+            tasks.append(asyncio.create_task(job(session, name, gate)))
+            await asyncio.sleep(0)
+        for gate in gates:
+            await asyncio.sleep(0.01)
+            gate.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["a0", "a1", "b1", "a2"]
+    assert positions == [2, 1]
+
+
+def test_waiters_time_out_and_leave_the_queue():
+    scheduler = GenerationScheduler(max_concurrent=1, queue_timeout=0.05)
+
+    async def main():
+        async with scheduler.slot("a"):
+            with pytest.raises(QueueTimeout):
+                async with scheduler.slot("b"):
+                    pass
+            assert scheduler.waiting() == 0
+
+    asyncio.run(main())
+    assert scheduler.running == 0
+    assert scheduler.tasks == {}
+
+
+def test_cancel_stops_a_sessions_queued_generations():
+    scheduler = GenerationScheduler(max_concurrent=1, queue_timeout=5)
+
+    async def queued():
+        async with scheduler.slot("b"):
+            pass
+
+    async def main():
+        async with scheduler.slot("a"):
+            task = asyncio.create_task(queued())
+            await asyncio.sleep(0.01)
+            assert scheduler.waiting() == 1
+            scheduler.cancel("b")
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert scheduler.waiting() == 0
+
+    asyncio.run(main())
+    assert scheduler.running == 0
+    assert scheduler.tasks == {}
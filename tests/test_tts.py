@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+from benchmarks.voice import tone_wav
+from tts import SentenceSpeaker, TTSBackend
+
+
+class ToneBackend(TTSBackend):
+    """Renders one second of tone per sentence, taking `latency` seconds."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, mime_type):
+        with self.lock:
+            self.calls.append(text)
+        time.sleep(self.latency)
+        return tone_wav(440, seconds=0.05)
+
+
+def test_sentences_are_sent_in_order_with_their_length():
+    backend = ToneBackend()
+    sent = []
+
+    async def send(audio, index):
+        sent.append(index)
+
+    async def main():
+        speaker = SentenceSpeaker(send, "audio/wav", backend, concurrency=2)
+        for token in "First sentence here. Second sentence here. Third one":
+            speaker.feed(token)
+        await speaker.finish()
+        speaker.close()
+
+    asyncio.run(main())
+    assert sent == [1, 2, 3]
+    assert backend.calls == [
+        "First sentence here.",
+        "Second sentence here.",
+        "Third one",
+    ]
+    assert backend.synthesize_timed("x", "audio/wav")[1] == 0.05
+
+
+def test_close_stops_delivery_and_pending_sentences():
+    backend = ToneBackend(latency=0.05)
+    sent = []
+
+    async def send(audio, index):
+        sent.append(index)
+
+    async def main():
+        speaker = SentenceSpeaker(send, "audio/wav", backend, concurrency=1)
+        speaker.feed("One sentence to say. Two sentences to say. Three more to say. ")
+        await asyncio.sleep(0.01)
+        speaker.close()
+        await asyncio.sleep(0.2)
+        assert speaker.delivery.cancelled()
+        assert not speaker.renders
+
+    asyncio.run(main())
+    assert backend.calls == ["One sentence to say."]
+    assert sent == []